@@ -0,0 +1,148 @@
+"""
+Benchmark the chat tokenizer against the previous per-line parsing loop.
+
+Usage: python benchmark_parser.py ["Dec 25 Batch/_chat.txt"] [repeats]
+
+Both paths run over the same in-memory lines, so the numbers measure
+tokenizing only (no file I/O or transcript injection).
+"""
+import os
+import re
+import sys
+import time
+import unicodedata
+from datetime import datetime, timedelta
+
+# Add src to path
+sys.path.append(os.getcwd())
+
+from src.backend.tokenizer import MessageTokenizer, detect_date_order
+
+CHAT_FILE = sys.argv[1] if len(sys.argv) > 1 else os.path.join("Dec 25 Batch", "_chat.txt")
+REPEATS = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+
+def legacy_extract_video_url(text):
+    if not text:
+        return None
+    youtube_regex = r'https?://(?:www\.)?(?:youtube\.com/(?:watch\?v=|embed/)|youtu\.be/)([\w\-]+)'
+    match = re.search(youtube_regex, text)
+    if match:
+        return f"https://www.youtube.com/watch?v={match.group(1)}"
+    if "URL:" in text:
+        try:
+            idx = text.find("URL:")
+            possible_url = text[idx+4:].strip().split()[0]
+            if "http" in possible_url:
+                vid_match = re.search(r'(?:v=|youtu\.be/|embed/)([\w\-]+)', possible_url)
+                if vid_match:
+                    return f"https://www.youtube.com/watch?v={vid_match.group(1)}"
+                return possible_url
+        except:
+            pass
+    return None
+
+
+def legacy_tokenize(lines):
+    """The hot loop of ChatParser.parse() before the tokenizer was introduced."""
+    line_pattern = re.compile(r'^\[(\d{1,2}/\d{1,2}/\d{2,4}),\s*(\d{1,2}:\d{2}:\d{2}\s*[APap][Mm])\]\s*(.*?):\s*(.*)$')
+
+    def parse_datetime(date_s, time_s):
+        dt_str = f"{date_s} {time_s}"
+        for fmt in ["%m/%d/%y %I:%M:%S %p", "%m/%d/%Y %I:%M:%S %p",
+                    "%d/%m/%y %I:%M:%S %p", "%d/%m/%Y %I:%M:%S %p"]:
+            try:
+                return datetime.strptime(dt_str, fmt)
+            except ValueError:
+                continue
+        return datetime.now()
+
+    all_messages = []
+    for line in lines:
+        line = line.strip()
+        line = line.replace('\u200e', '').replace('\u200f', '')
+        if not line:
+            continue
+        match = line_pattern.match(line)
+        if match:
+            date_str, time_str, sender, msg_content = match.groups()
+            dt_obj = parse_datetime(date_str, time_str)
+            attachment_match = re.search(r'<attached:\s*(.*?)>', msg_content)
+            msg_type = "text"
+            url = None
+            file_path = None
+            if attachment_match:
+                filename = attachment_match.group(1).strip()
+                ext = os.path.splitext(filename)[1].lower()
+                if ext in ['.jpg', '.jpeg', '.png', '.webp', '.gif']:
+                    msg_type = "image"
+                    file_path = f"/static/{filename}"
+                elif ext in ['.mp4', '.mov']:
+                    msg_type = "video_file"
+                    file_path = f"/static/{filename}"
+                msg_content = msg_content.replace(attachment_match.group(0), "").strip()
+            else:
+                msg_content = "".join(ch for ch in msg_content if unicodedata.category(ch)[0] != "C")
+                lower_content = msg_content.lower()
+                if "joined using a group" in lower_content or "joined using this group" in lower_content:
+                    continue
+                if "security code changed" in lower_content:
+                    continue
+                if "added" in lower_content:
+                    if re.search(r'added\s+[\+~]', msg_content) or "added you" in lower_content:
+                        continue
+                if lower_content.strip() == "left":
+                    continue
+                url = legacy_extract_video_url(msg_content)
+            all_messages.append({
+                "type": msg_type, "time_obj": dt_obj, "time": time_str,
+                "sender": sender.strip(),
+                "content": msg_content if msg_content else (file_path if file_path else ""),
+                "is_video": True if url else False, "video_url": url, "image_url": file_path
+            })
+        elif all_messages:
+            new_line_url = legacy_extract_video_url(line)
+            last_msg = all_messages[-1]
+            if last_msg["is_video"] and new_line_url and new_line_url != last_msg["video_url"]:
+                split_msg = last_msg.copy()
+                split_msg["content"] = line
+                split_msg["video_url"] = new_line_url
+                split_msg["is_video"] = True
+                split_msg["image_url"] = None
+                split_msg["time_obj"] = last_msg["time_obj"] + timedelta(milliseconds=100)
+                all_messages.append(split_msg)
+            else:
+                all_messages[-1]["content"] += "\n" + line
+                if not all_messages[-1]["is_video"]:
+                    url = legacy_extract_video_url(all_messages[-1]["content"])
+                    if url:
+                        all_messages[-1]["is_video"] = True
+                        all_messages[-1]["video_url"] = url
+    return all_messages
+
+
+def tokenizer_tokenize(lines):
+    tokenizer = MessageTokenizer(detect_date_order(lines))
+    return list(tokenizer.tokenize(enumerate(lines)))
+
+
+def run(name, func, lines):
+    # Warm up (fills the re module cache for the legacy path)
+    count = len(func(lines))
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        func(lines)
+    elapsed = time.perf_counter() - start
+    rate = len(lines) * REPEATS / elapsed
+    print(f"{name:<10} {count:>6} messages  {rate:>12,.0f} lines/sec")
+    return rate
+
+
+if __name__ == "__main__":
+    with open(CHAT_FILE, 'r', encoding='utf-8') as f:
+        lines = f.read().splitlines()
+
+    print(f"Benchmarking {CHAT_FILE}: {len(lines)} lines x {REPEATS} repeats")
+    before = run("before", legacy_tokenize, lines)
+    after = run("after", tokenizer_tokenize, lines)
+    print(f"Speedup: {after / before:.2f}x")
@@ -0,0 +1,74 @@
+"""
+Checks that the backend survives youtube_transcripts.txt being rewritten
+in place (truncated, then regrown) while it serves /api/transcripts and
+that the hot reload picks up the new text. Runs against temporary copies
+of "Dec 25 Batch" and the transcript file, so the real data is untouched.
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+
+sys.path.append(os.getcwd())
+
+from fastapi.testclient import TestClient
+import src.backend.main as backend
+from src.backend.transcripts import TranscriptStore
+
+
+def check_transcript_reload():
+    work_dir = tempfile.mkdtemp()
+    batch_dir = os.path.join(work_dir, "batch")
+    os.makedirs(batch_dir)
+    shutil.copy(os.path.join("Dec 25 Batch", "_chat.txt"), batch_dir)
+    transcript_file = os.path.join(work_dir, "youtube_transcripts.txt")
+    shutil.copy("youtube_transcripts.txt", transcript_file)
+
+    backend.BASE_DIR = work_dir
+    backend.BATCHES = {backend.DEFAULT_BATCH: batch_dir}
+    backend.TRANSCRIPT_FILE = transcript_file
+    backend.transcript_store = TranscriptStore(transcript_file)
+    backend.SUMMARY_CACHE_FILE = os.path.join(work_dir, "summaries.sqlite3")
+    backend.RELOAD_INTERVAL = 0.2
+
+    try:
+        with TestClient(backend.app) as client:
+            timeline = client.get("/api/timeline").json()
+            ids = [m["transcript_id"] for day in timeline for m in day["messages"] if m.get("transcript_id")]
+            print(f"Serving {len(ids)} transcript stubs.")
+
+            failures = []
+            done = threading.Event()
+
+            def read_transcripts():
+                while not done.is_set():
+                    for tid in ids:
+                        status = client.get(f"/api/transcripts/{tid}").status_code
+                        if status not in (200, 404):
+                            failures.append((tid, status))
+
+            reader = threading.Thread(target=read_transcripts)
+            reader.start()
+
+            with open(transcript_file, "r", encoding="utf-8") as f:
+                original = f.read()
+            # In-place rewrites, as an editor or an open(..., 'w') regenerator does
+            for content in (original[:len(original) // 4], original.replace(" the ", " THE ")):
+                with open(transcript_file, "w", encoding="utf-8") as f:
+                    f.write(content)
+                time.sleep(1)
+
+            done.set()
+            reader.join()
+            print(f"Failed requests during rewrites: {failures or 'none'}")
+
+            body = client.get(f"/api/transcripts/{ids[0]}").json()["content"]
+            print(f"Serves the rewritten text: {' THE ' in body or ' the ' not in body}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    check_transcript_reload()
@@ -6,19 +6,35 @@ import sys
 sys.path.append(os.getcwd())
 
 from src.backend.parser import ChatParser
+from src.backend.transcripts import TranscriptStore
+from src.backend.static_export import export_static_timeline, inline_transcripts
 
 BASE_DIR = os.getcwd()
 CHAT_FILE = os.path.join(BASE_DIR, "whatsapp_export", "extracted", "_chat.txt")
-ORIGINAL_CHAT_FILE = os.path.join(BASE_DIR, "whatsapp_export", "extracted", "_chat.txt")
 IMAGES_DIR = os.path.join(BASE_DIR, "whatsapp_export", "extracted")
 OUTPUT_FILE = os.path.join(BASE_DIR, "src", "frontend", "public", "timeline.json")
+# Manifest + per-day and per-transcript shards loaded by the frontend
+SHARD_DIR = os.path.join(BASE_DIR, "src", "frontend", "public", "data", "oct2025")
+TRANSCRIPT_FILE = os.path.join(BASE_DIR, "youtube_transcripts.txt")
+# Also write .gz/.br copies of every shard for hosts that serve them
+COMPRESS = "--compress" in sys.argv
+# Parser state from the last run; only messages appended since are re-parsed
+CHECKPOINT_FILE = os.path.join(BASE_DIR, ".cache", "timeline.checkpoint.json")
 
 print(f"Parsing chat from {CHAT_FILE}...")
-parser = ChatParser(CHAT_FILE, IMAGES_DIR, ORIGINAL_CHAT_FILE)
-timeline = parser.parse()
+transcript_store = TranscriptStore(TRANSCRIPT_FILE)
+parser = ChatParser(CHAT_FILE, IMAGES_DIR,
+                    transcript_store=transcript_store, transcript_stubs=True)
+timeline = parser.parse(checkpoint_file=CHECKPOINT_FILE)
 
+print(f"Writing {len(timeline)} day shards to {SHARD_DIR}...")
+manifest = export_static_timeline(timeline, SHARD_DIR, transcript_store, compress=COMPRESS)
+print(f"Wrote {len(manifest['days'])} days and {len(manifest['transcripts'])} transcripts.")
+
+# Single-file copy with full transcripts, for the analysis scripts and as a
+# fallback for older frontends
 print(f"Saving {len(timeline)} days to {OUTPUT_FILE}...")
 with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-    json.dump(timeline, f, ensure_ascii=False, indent=2)
+    json.dump(inline_transcripts(timeline, transcript_store), f, ensure_ascii=False, separators=(',', ':'))
 
 print("Done!")
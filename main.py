@@ -90,9 +90,11 @@ def main():
                 break
             if not query.strip(): continue
             
-            print("Thinking...")
-            answer = rag.query(query)
-            print(f"\nAI: {answer}\n")
+            # Print the answer as it is generated instead of waiting for all of it
+            print("\nAI: ", end="", flush=True)
+            for token in rag.stream_query(query):
+                print(token, end="", flush=True)
+            print("\n")
         except KeyboardInterrupt:
             break
         except Exception as e:
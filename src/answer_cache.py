@@ -0,0 +1,100 @@
+import re
+import time
+import threading
+from collections import OrderedDict
+import numpy as np
+
+ANSWER_CACHE_SIZE = 256
+# Seconds an answer stays valid
+ANSWER_CACHE_TTL = 3600
+
+TRAILING_PUNCTUATION = re.compile(r'[\s?!.]+$')
+
+
+def normalize_question(question):
+    """Case, whitespace and trailing punctuation don't change the answer."""
+    return TRAILING_PUNCTUATION.sub("", " ".join(question.lower().split()))
+
+
+class AnswerCache:
+    """
+    LRU of answers keyed by (scope, normalized question), where scope is
+    whatever else the answer depends on (index version, retrieval filter).
+
+    With similarity_threshold and an embed function, a miss on the exact key
+    falls back to the most similar cached question in the same scope, so
+    rephrasings like "who shared the lentil recipe" / "who posted the
+    lentil recipe" share one completion. Entries expire after ttl seconds.
+    """
+
+    def __init__(self, max_entries=ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL,
+                 similarity_threshold=None, embed=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold if embed else None
+        self.embed = embed
+        self._entries = OrderedDict()  # key -> (expires_at, answer, unit vector or None)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _vector(self, question):
+        vector = np.asarray(self.embed(question), dtype="float32")
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _expire(self, now):
+        for key in [k for k, (expires_at, _, _) in self._entries.items() if expires_at <= now]:
+            del self._entries[key]
+
+    def get(self, scope, question):
+        """Returns (answer, vector); answer is None on a miss."""
+        key = (scope, normalize_question(question))
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1], entry[2]
+
+        vector = None
+        if self.similarity_threshold is not None:
+            # Embed outside the lock; this is a network call
+            vector = self._vector(key[1])
+            with self._lock:
+                best_key, best_score = None, self.similarity_threshold
+                for other_key, (_, _, other) in self._entries.items():
+                    if other_key[0] != scope or other is None:
+                        continue
+                    score = float(vector @ other)
+                    if score >= best_score:
+                        best_key, best_score = other_key, score
+                if best_key is not None:
+                    self._entries.move_to_end(best_key)
+                    self.hits += 1
+                    return self._entries[best_key][1], vector
+
+        with self._lock:
+            self.misses += 1
+        return None, vector
+
+    def put(self, scope, question, answer, vector=None):
+        """vector is the one returned by get(), to avoid embedding twice."""
+        if vector is None and self.similarity_threshold is not None:
+            vector = self._vector(normalize_question(question))
+        key = (scope, normalize_question(question))
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, answer, vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
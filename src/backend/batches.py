@@ -0,0 +1,215 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+from .parser import ChatParser
+from .message_store import MessageStore
+from .reloader import file_signature
+
+CHAT_FILENAME = "_chat.txt"
+# Packed timelines kept in memory at once, across all batches
+MAX_LOADED_BYTES = 256 * 1024 * 1024
+# How deep below the root export directories are looked for
+DISCOVERY_DEPTH = 2
+# Never exports, and large enough to make discovery slow
+SKIPPED_DIRS = {"src", "node_modules", "__pycache__", "transcript_cache"}
+# Attachment URLs as the tokenizer writes them, and as the registry serves them
+STATIC_PREFIX = "/static/"
+MEDIA_URL = "/api/batches/{batch_id}/media/"
+
+
+class UnknownBatchError(KeyError):
+    pass
+
+
+def batch_id_for(path: str) -> str:
+    """URL-safe ID from an export directory name, e.g. 'Dec 25 Batch' -> 'dec-25-batch'."""
+    return re.sub(r'[^a-z0-9]+', '-', os.path.basename(path).lower()).strip('-') or "batch"
+
+
+def qualify_media_urls(timeline: list, batch_id: str) -> list:
+    """
+    Points the /static/<file> attachment URLs of a parsed timeline at the
+    batch's own media route, since every batch keeps its attachments in
+    its own directory. Modifies timeline in place.
+    """
+    prefix = MEDIA_URL.format(batch_id=batch_id)
+    for day in timeline:
+        for msg in day["messages"]:
+            url = msg.get("image_url")
+            if url and url.startswith(STATIC_PREFIX):
+                msg["image_url"] = prefix + url[len(STATIC_PREFIX):]
+                # Image messages carry their URL as content too
+                if msg["content"] == url:
+                    msg["content"] = msg["image_url"]
+    return timeline
+
+
+class BatchRegistry:
+    """
+    The WhatsApp exports the backend can serve, one batch per directory
+    holding a _chat.txt.
+
+    Batches are found by scanning root (known batches keep their historic
+    IDs) and parsed only when first requested. Parsed timelines are kept in
+    an LRU bounded by their packed size, so any number of cohorts can be
+    served from one process; pinned batches are never evicted.
+    """
+
+    def __init__(self, root: str, known: dict = None, transcript_store=None,
+                 max_loaded_bytes: int = MAX_LOADED_BYTES, pinned: set = ()):
+        self.root = root
+        self.known = dict(known or {})
+        self.transcript_store = transcript_store
+        self.max_loaded_bytes = max_loaded_bytes
+        self.pinned = set(pinned)
+        self.dirs = {}
+        self._loaded = OrderedDict()
+        # Signature of each loaded batch's _chat.txt when it was parsed
+        self._signatures = {}
+        self._lock = threading.Lock()
+        # One lock per batch so a slow parse only blocks requests for that batch
+        self._load_locks = {}
+        self.discover()
+
+    def discover(self) -> dict:
+        """Rescans root for export directories. Returns {batch_id: directory}."""
+        dirs = {}
+        known_ids = {os.path.normpath(path): batch_id for batch_id, path in self.known.items()}
+        root_depth = self.root.rstrip(os.sep).count(os.sep)
+        for current, subdirs, files in os.walk(self.root):
+            subdirs[:] = sorted(d for d in subdirs if not d.startswith('.') and d not in SKIPPED_DIRS)
+            if current.count(os.sep) - root_depth >= DISCOVERY_DEPTH:
+                subdirs[:] = []
+            if CHAT_FILENAME not in files or os.path.normpath(current) == os.path.normpath(self.root):
+                continue
+            batch_id = known_ids.get(os.path.normpath(current)) or batch_id_for(current)
+            # Two directories with the same name: keep the first, make the rest unique
+            base_id, n = batch_id, 2
+            while batch_id in dirs:
+                batch_id, n = f"{base_id}-{n}", n + 1
+            dirs[batch_id] = current
+        # Known batches are listed even before their export is copied in
+        for batch_id, path in self.known.items():
+            dirs.setdefault(batch_id, path)
+        with self._lock:
+            self.dirs = dirs
+        return dirs
+
+    def chat_file(self, batch_id: str) -> str:
+        try:
+            return os.path.join(self.dirs[batch_id], CHAT_FILENAME)
+        except KeyError:
+            raise UnknownBatchError(batch_id) from None
+
+    def parse(self, batch_id: str, transcript_store=None) -> tuple:
+        """
+        Parses a batch without loading it. Returns (store, signature of the
+        chat file); the signature is taken first, so edits made during the
+        parse still show up in stale().
+        """
+        directory = self.dirs[batch_id]
+        chat_file = self.chat_file(batch_id)
+        signature = file_signature(chat_file)
+        print(f"Loading batch {batch_id} from {chat_file}...")
+        parser = ChatParser(chat_file, directory,
+                            transcript_store=transcript_store or self.transcript_store,
+                            transcript_stubs=True)
+        timeline = qualify_media_urls(parser.parse(), batch_id)
+        return MessageStore.from_timeline(timeline, parser.video_index), signature
+
+    def media_path(self, batch_id: str, filename: str) -> str | None:
+        """Path of an attachment inside the batch directory, or None if there is none."""
+        try:
+            directory = os.path.realpath(self.dirs[batch_id])
+        except KeyError:
+            raise UnknownBatchError(batch_id) from None
+        path = os.path.realpath(os.path.join(directory, filename))
+        # No escaping the export directory with ../ or absolute paths
+        if os.path.commonpath([directory, path]) != directory or not os.path.isfile(path):
+            return None
+        return path
+
+    def get(self, batch_id: str) -> MessageStore:
+        """The batch's timeline, parsing it if it is not loaded."""
+        with self._lock:
+            if batch_id not in self.dirs:
+                raise UnknownBatchError(batch_id)
+            store = self._loaded.get(batch_id)
+            if store is not None:
+                self._loaded.move_to_end(batch_id)
+                return store
+            load_lock = self._load_locks.setdefault(batch_id, threading.Lock())
+
+        with load_lock:
+            # Another request may have parsed it while we waited
+            with self._lock:
+                store = self._loaded.get(batch_id)
+            if store is None:
+                store, signature = self.parse(batch_id)
+                self.put(batch_id, store, signature)
+            return store
+
+    def put(self, batch_id: str, store: MessageStore, signature=None):
+        """Adds (or replaces) a loaded timeline and evicts to stay within budget."""
+        with self._lock:
+            self._loaded[batch_id] = store
+            self._signatures[batch_id] = signature
+            self._loaded.move_to_end(batch_id)
+            self._evict(keep=batch_id)
+
+    def _evict(self, keep: str):
+        total = sum(s.nbytes for s in self._loaded.values())
+        for batch_id in list(self._loaded):
+            if total <= self.max_loaded_bytes:
+                break
+            if batch_id == keep or batch_id in self.pinned:
+                continue
+            total -= self._loaded.pop(batch_id).nbytes
+            self._signatures.pop(batch_id, None)
+            print(f"Unloaded batch {batch_id} to stay within {self.max_loaded_bytes // 1024 // 1024} MB.")
+
+    def is_loaded(self, batch_id: str) -> bool:
+        return batch_id in self._loaded
+
+    def loaded_ids(self) -> list:
+        with self._lock:
+            return list(self._loaded)
+
+    def stale(self) -> dict:
+        """{batch_id: new signature} for loaded batches whose _chat.txt changed."""
+        with self._lock:
+            recorded = dict(self._signatures)
+        changed = {}
+        for batch_id, signature in recorded.items():
+            if batch_id not in self.dirs:
+                continue
+            current = file_signature(self.chat_file(batch_id))
+            if current is not None and current != signature:
+                changed[batch_id] = current
+        return changed
+
+    @property
+    def loaded_bytes(self) -> int:
+        with self._lock:
+            return sum(s.nbytes for s in self._loaded.values())
+
+    def describe(self) -> list:
+        """One entry per batch for /api/batches; day counts only for loaded ones."""
+        with self._lock:
+            entries = []
+            for batch_id, directory in sorted(self.dirs.items()):
+                store = self._loaded.get(batch_id)
+                entries.append({
+                    "id": batch_id,
+                    "name": os.path.relpath(directory, self.root),
+                    "available": os.path.exists(os.path.join(directory, CHAT_FILENAME)),
+                    "loaded": store is not None,
+                    "days": len(store) if store is not None else None,
+                })
+            return entries
+
+    def clear(self):
+        with self._lock:
+            self._loaded.clear()
+            self._signatures.clear()
@@ -0,0 +1,83 @@
+import asyncio
+from contextlib import asynccontextmanager
+import httpx
+from langchain_groq import ChatGroq
+
+DEFAULT_MODEL = "llama-3.3-70b-versatile"
+
+
+class LLMBusyError(Exception):
+    """No LLM slot freed up within the queue timeout."""
+
+
+class LLMClientManager:
+    """
+    One ChatGroq client for the whole process, created at startup.
+
+    The underlying httpx clients keep connections alive between requests,
+    so summaries after the first skip the TCP/TLS setup. At most
+    max_concurrency completions run at once; further requests queue for up
+    to queue_timeout seconds and then fail with LLMBusyError. base_url
+    points the client at any OpenAI-compatible server, e.g. a local stub.
+    """
+
+    def __init__(self, api_key: str, model: str = DEFAULT_MODEL, base_url: str = None,
+                 max_concurrency: int = 8, queue_timeout: float = 30.0,
+                 max_connections: int = 20, keepalive_expiry: float = 60.0,
+                 request_timeout: float = 120.0):
+        self.api_key = api_key
+        self.model = model
+        self.base_url = base_url
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.request_timeout = request_timeout
+        self.llm = None
+        self._http_client = None
+        self._http_async_client = None
+        self._semaphore = None
+
+    def start(self):
+        timeout = httpx.Timeout(self.request_timeout)
+        self._http_client = httpx.Client(limits=self.limits, timeout=timeout)
+        self._http_async_client = httpx.AsyncClient(limits=self.limits, timeout=timeout)
+        kwargs = {"base_url": self.base_url} if self.base_url else {}
+        self.llm = ChatGroq(
+            model=self.model,
+            api_key=self.api_key,
+            http_client=self._http_client,
+            http_async_client=self._http_async_client,
+            **kwargs,
+        )
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def aclose(self):
+        if self._http_async_client is not None:
+            await self._http_async_client.aclose()
+            self._http_client.close()
+        self.llm = None
+        self._http_client = None
+        self._http_async_client = None
+
+    async def acquire(self) -> ChatGroq:
+        """Waits for a free slot and returns the shared client."""
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise LLMBusyError(f"No LLM slot available after {self.queue_timeout:g}s")
+        return self.llm
+
+    def release(self):
+        self._semaphore.release()
+
+    @asynccontextmanager
+    async def slot(self):
+        llm = await self.acquire()
+        try:
+            yield llm
+        finally:
+            self.release()
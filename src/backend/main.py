@@ -1,41 +1,174 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
 import os
+import json
+import asyncio
+from datetime import datetime
 from contextlib import asynccontextmanager
-from .parser import ChatParser # Relative import for package
-from langchain_groq import ChatGroq
+from .search_index import SearchIndex
+from .message_store import MessageStore, day_key
+from .batches import BatchRegistry, UnknownBatchError, MAX_LOADED_BYTES
+from .reloader import PollingWatcher, file_signature, POLL_INTERVAL
+from .responses import EncodedBodyCache
+from .transcripts import TranscriptStore
+from .llm_client import LLMClientManager, LLMBusyError
+from .summary_cache import SummaryCache, summary_key
+from .summarizer import MapReduceSummarizer, summary_prompt
 from dotenv import load_dotenv
 
 # Load env vars
 load_dotenv()
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+# Optional: any OpenAI-compatible endpoint, e.g. a local stub server
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL")
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+# Seconds a summary request waits for a free LLM slot before a 503
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "30"))
 
 # Paths
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 CHAT_FILE = os.path.join(BASE_DIR, "whatsapp_export", "extracted", "_chat.txt")
-ORIGINAL_CHAT_FILE = os.path.join(BASE_DIR, "whatsapp_export", "extracted", "_chat.txt")
 IMAGES_DIR = os.path.join(BASE_DIR, "whatsapp_export", "extracted")
+DEC_IMAGES_DIR = os.path.join(BASE_DIR, "Dec 25 Batch")
+TRANSCRIPT_FILE = os.path.join(BASE_DIR, "youtube_transcripts.txt")
+SUMMARY_CACHE_FILE = os.path.join(BASE_DIR, ".cache", "summaries.sqlite3")
+# Memory budget for parsed batches, in MB of packed timeline
+BATCH_CACHE_MB = int(os.getenv("BATCH_CACHE_MB", str(MAX_LOADED_BYTES // 1024 // 1024)))
+# Seconds between checks for changed exports; 0 disables hot reload
+RELOAD_INTERVAL = float(os.getenv("RELOAD_INTERVAL", str(POLL_INTERVAL)))
+# Set SUMMARY_PREWARM=1 to summarize every transcript in the background at startup
+SUMMARY_PREWARM = os.getenv("SUMMARY_PREWARM") == "1"
 
-# Cache timeline in memory
+# Batches with fixed IDs (see add_batch_selector.py); any other directory
+# under BASE_DIR holding a _chat.txt is discovered as a batch too
+DEFAULT_BATCH = "oct2025"
+BATCHES = {
+    "oct2025": IMAGES_DIR,
+    "dec2025": DEC_IMAGES_DIR,
+}
+
+# Cache timeline in memory, packed into a MessageStore
 timeline_cache = None
+# Parsed timelines per batch; the default batch is parsed at startup and
+# kept, the others are parsed on first request and may be evicted
+batches = None
+# Serialized and compressed /api/timeline pages
+timeline_responses = EncodedBodyCache()
+# Transcript bodies stay on disk; the timeline only carries stubs
+transcript_store = TranscriptStore(TRANSCRIPT_FILE)
+transcript_responses = EncodedBodyCache(max_entries=32)
+# Inverted index over timeline_cache for /api/search
+search_index = None
+# Shared, pooled ChatGroq client for the summary endpoints
+llm_clients = None
+# Summaries already generated, keyed by model + prompt
+summary_cache = None
+summarizer = None
+# Re-parses exports that change on disk and swaps the results in
+watcher = None
+# Size and mtime of the transcript file the loaded timelines were built from
+transcripts_signature = None
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Load and parse chat log on startup
-    global timeline_cache
-    print(f"Loading chat from {CHAT_FILE} and images from {IMAGES_DIR}...")
-    if os.path.exists(ORIGINAL_CHAT_FILE):
-        print(f"Using original chat export for video dates: {ORIGINAL_CHAT_FILE}")
-    else:
-        print(f"Original chat file not found at {ORIGINAL_CHAT_FILE}")
+    global timeline_cache, search_index, llm_clients, summary_cache, summarizer, batches, watcher
+    global transcripts_signature
+    batches = BatchRegistry(BASE_DIR, BATCHES, transcript_store,
+                            max_loaded_bytes=BATCH_CACHE_MB * 1024 * 1024, pinned={DEFAULT_BATCH})
+    print(f"Found batches: {', '.join(batches.dirs)}")
+    print(f"Loading chat from {batches.chat_file(DEFAULT_BATCH)} and images from {batches.dirs[DEFAULT_BATCH]}...")
 
-    parser = ChatParser(CHAT_FILE, IMAGES_DIR, ORIGINAL_CHAT_FILE)
-    timeline_cache = parser.parse()
-    print(f"Loaded {len(timeline_cache)} days of content.")
+    transcripts_signature = file_signature(TRANSCRIPT_FILE)
+    timeline_cache = batches.get(DEFAULT_BATCH)
+    print(f"Loaded {len(timeline_cache)} days of content "
+          f"({timeline_cache.message_count} messages, {timeline_cache.nbytes // 1024} KB packed).")
+    search_index = SearchIndex.build(timeline_cache, transcript_store)
+    print(f"Indexed {len(search_index)} messages for search.")
+    if GROQ_API_KEY:
+        llm_clients = LLMClientManager(
+            GROQ_API_KEY, base_url=GROQ_BASE_URL,
+            max_concurrency=LLM_MAX_CONCURRENCY, queue_timeout=LLM_QUEUE_TIMEOUT,
+        )
+        llm_clients.start()
+    summary_cache = SummaryCache(SUMMARY_CACHE_FILE)
+    if llm_clients:
+        summarizer = MapReduceSummarizer(llm_clients, summary_cache)
+    prewarm = None
+    if llm_clients and SUMMARY_PREWARM:
+        prewarm = asyncio.create_task(prewarm_summaries(timeline_cache))
+    if RELOAD_INTERVAL > 0:
+        watcher = PollingWatcher(find_changed_exports, reload_exports, RELOAD_INTERVAL)
+        watcher.start()
     yield
+    if watcher:
+        watcher.stop()
+        watcher = None
+    if prewarm:
+        prewarm.cancel()
+    summary_cache.close()
+    summary_cache = None
+    summarizer = None
+    if llm_clients:
+        await llm_clients.aclose()
+        llm_clients = None
     timeline_cache = None
+    search_index = None
+    batches.clear()
+    batches = None
+    timeline_responses.clear()
+    transcript_responses.clear()
+    transcript_store.close()
+
+def find_changed_exports() -> dict:
+    """
+    What changed on disk since the data being served was built:
+    {batch_id: signature} for loaded batches, plus "transcripts".
+    """
+    changes = batches.stale()
+    signature = file_signature(TRANSCRIPT_FILE)
+    if signature is not None and signature != transcripts_signature:
+        changes["transcripts"] = signature
+    return changes
+
+def reload_exports(changes: dict):
+    """
+    Rebuilds the changed batches and their indexes off to the side, then
+    swaps them in. Requests already running keep the objects they started
+    with, so nothing is served half-built and nothing waits on the parse.
+    """
+    global timeline_cache, search_index, transcripts_signature
+    if "transcripts" in changes:
+        # transcript_store re-indexes itself on its next read; every loaded
+        # timeline still carries stubs from the old file
+        print(f"{TRANSCRIPT_FILE} changed, rebuilding timelines...")
+        batch_ids = batches.loaded_ids()
+    else:
+        batch_ids = [b for b in changes if batches.is_loaded(b)]
+
+    # Taken before parsing, so a change made meanwhile is picked up next poll
+    new_signature = file_signature(TRANSCRIPT_FILE)
+    rebuilt = {batch_id: batches.parse(batch_id) for batch_id in batch_ids}
+    new_timeline = rebuilt[DEFAULT_BATCH][0] if DEFAULT_BATCH in rebuilt else timeline_cache
+    new_index = search_index
+    if DEFAULT_BATCH in rebuilt:
+        new_index = SearchIndex.build(new_timeline, transcript_store)
+
+    # The swap: plain reference assignments, no parsing past this point
+    for batch_id, (timeline, signature) in rebuilt.items():
+        batches.put(batch_id, timeline, signature)
+    timeline_cache = new_timeline
+    search_index = new_index
+    transcripts_signature = new_signature
+    timeline_responses.clear()
+    transcript_responses.clear()
+    print(f"Reloaded {', '.join(rebuilt) or 'transcripts'} "
+          f"({len(timeline_cache)} days in {DEFAULT_BATCH}).")
 
 app = FastAPI(lifespan=lifespan)
 
@@ -47,58 +180,291 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Link", "X-Next-Cursor", "X-Total-Days"],
 )
 
-# Serve Images
+# Serve Images of timelines generated before media was served per batch
 if os.path.exists(IMAGES_DIR):
     app.mount("/static", StaticFiles(directory=IMAGES_DIR), name="static")
 
-@app.get("/api/timeline")
-def get_timeline():
-    if timeline_cache is None:
+def get_batch_timeline(batch: str) -> MessageStore:
+    try:
+        return batches.get(batch)
+    except UnknownBatchError:
+        raise HTTPException(status_code=404, detail=f"Unknown batch '{batch}'")
+
+def _date_param(value: str | None, name: str) -> str | None:
+    """Converts MM/DD/YYYY or YYYY-MM-DD to a sortable YYYYMMDD string."""
+    if not value:
+        return None
+    parts = value.replace("-", "/").split("/")
+    if len(parts) == 3 and all(p.isdigit() for p in parts):
+        if len(parts[0]) == 4:
+            year, month, day = parts
+        else:
+            month, day, year = parts
+        if len(year) == 4:
+            try:
+                return datetime(int(year), int(month), int(day)).strftime("%Y%m%d")
+            except ValueError:
+                pass
+    raise HTTPException(status_code=400, detail=f"Invalid {name} date '{value}', use MM/DD/YYYY or YYYY-MM-DD")
+
+@app.get("/api/batches")
+def list_batches(refresh: bool = False):
+    """
+    Every batch the backend can serve. Day counts are only filled in for
+    batches already loaded; refresh=true rescans for new export directories.
+    """
+    if refresh:
+        batches.discover()
+    return {"default": DEFAULT_BATCH, "batches": batches.describe()}
+
+def timeline_response(request: Request, batch: str, start: str | None, end: str | None,
+                      cursor: int, limit: int | None):
+    timeline = get_batch_timeline(batch)
+    start_key = _date_param(start, "start")
+    end_key = _date_param(end, "end")
+
+    # Filter on dates alone; only the days of the page are materialized
+    days = range(len(timeline))
+    if start_key or end_key:
+        days = [
+            d for d, date in enumerate(timeline.dates)
+            if (not start_key or day_key(date) >= start_key)
+            and (not end_key or day_key(date) <= end_key)
+        ]
+    stop = cursor + limit if limit else len(days)
+
+    body = timeline_responses.get(
+        (batch, timeline.version, start_key, end_key, cursor, limit),
+        lambda: [timeline[d] for d in days[cursor:stop]],
+    )
+
+    headers = {"X-Total-Days": str(len(days))}
+    if stop < len(days):
+        headers["X-Next-Cursor"] = str(stop)
+        headers["Link"] = f'<{request.url.include_query_params(cursor=stop)}>; rel="next"'
+    return body.respond(request, headers)
+
+@app.get("/api/batches/{batch_id}/media/{filename:path}")
+def get_batch_media(batch_id: str, filename: str):
+    """An attachment (image or video file) from a batch's export directory."""
+    try:
+        path = batches.media_path(batch_id, filename)
+    except UnknownBatchError:
+        raise HTTPException(status_code=404, detail=f"Unknown batch '{batch_id}'")
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"No file '{filename}' in batch '{batch_id}'")
+    return FileResponse(path, headers={"Cache-Control": "public, max-age=86400"})
+
+@app.get("/api/batches/{batch_id}/videos")
+def get_batch_videos(batch_id: str, limit: int = Query(20, ge=1)):
+    """The most shared YouTube videos of a batch, with when each was first shared."""
+    index = get_batch_timeline(batch_id).video_index
+    if index is None:
         return []
-    return timeline_cache
+    return [
+        {"id": video_id, "shares": shares, "first_shared": index.first_shared(video_id)}
+        for video_id, shares in index.most_shared(limit)
+    ]
+
+@app.get("/api/batches/{batch_id}/videos/{video_id}")
+def get_batch_video(batch_id: str, video_id: str):
+    """Every share of one video in a batch: date, time and sender."""
+    timeline = get_batch_timeline(batch_id)
+    entry = timeline.video_index.get(video_id) if timeline.video_index else None
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"Video '{video_id}' was not shared in batch '{batch_id}'")
+    shares = []
+    for position in entry["positions"]:
+        date, msg = timeline.message_at(position)
+        shares.append({"date": date, "time": msg["time"], "sender": msg["sender"], "video_url": msg["video_url"]})
+    return {"id": video_id, "first_shared": entry["first_shared"], "shares": shares}
+
+@app.get("/api/batches/{batch_id}/timeline")
+def get_batch_timeline_page(
+    batch_id: str,
+    request: Request,
+    start: str | None = None,
+    end: str | None = None,
+    cursor: int = Query(0, ge=0),
+    limit: int | None = Query(None, ge=1),
+):
+    """
+    Returns the days of a batch, optionally limited to a date range and
+    paged with cursor/limit (in days). The next page's cursor, if any, is in
+    the X-Next-Cursor header. Bodies are serialized and compressed once per
+    page and carry a strong ETag, so unchanged pages come back as 304.
+    """
+    return timeline_response(request, batch_id, start, end, cursor, limit)
+
+@app.get("/api/timeline")
+def get_timeline(
+    request: Request,
+    batch: str = DEFAULT_BATCH,
+    start: str | None = None,
+    end: str | None = None,
+    cursor: int = Query(0, ge=0),
+    limit: int | None = Query(None, ge=1),
+):
+    """Same as /api/batches/{batch}/timeline, with the batch as a query parameter."""
+    return timeline_response(request, batch, start, end, cursor, limit)
+
+@app.get("/api/timeline_dec2025")
+def get_timeline_dec2025(request: Request):
+    """Kept for older frontends; the whole dec2025 batch."""
+    return timeline_response(request, "dec2025", None, None, 0, None)
+
+@app.get("/api/transcripts/{transcript_id}")
+def get_transcript(transcript_id: str, request: Request):
+    """
+    Full body of a transcript stub from the timeline. IDs are positions in
+    youtube_transcripts.txt, not content hashes, so the body behind one can
+    change when the file is edited; clients revalidate with the ETag.
+    """
+    if not transcript_store.exists():
+        raise HTTPException(status_code=404, detail="Transcript file not found")
+    content = transcript_store.get_by_id(transcript_id)
+    if content is None:
+        raise HTTPException(status_code=404, detail=f"No transcript '{transcript_id}'")
+
+    video_id = transcript_id.partition(".")[0]
+    body = transcript_responses.get(
+        (transcript_id, tuple(transcript_store.signature)),
+        lambda: {
+            "id": transcript_id,
+            "video_url": f"https://www.youtube.com/watch?v={video_id}",
+            "content": content,
+        },
+    )
+    return body.respond(request)
 
 @app.get("/api/search")
 def search(q: str):
-    if not timeline_cache:
+    """
+    Searches messages, senders and transcripts. Supports plain terms (all
+    must match), prefixes (nutri*) and quoted phrases ("whole food").
+    """
+    index = search_index
+    if not index:
         return []
-    
-    results = []
-    query = q.lower()
-    for day in timeline_cache:
-        for msg in day['messages']:
-            txt = msg['content'] if isinstance(msg['content'], str) else ""
-            snd = msg['sender'] if isinstance(msg['sender'], str) else ""
-            if query in txt.lower() or query in snd.lower():
-                results.append({
-                    "date": day['date'],
-                    "time": msg['time'],
-                    "sender": msg['sender'],
-                    "snippet": txt[:200] + "..."
-                })
-    return results
+    return index.search(q)
 
 class SummaryRequest(BaseModel):
     text: str
 
+def _llm_busy(e: LLMBusyError) -> HTTPException:
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+
+async def generate_summary(text: str) -> str:
+    """
+    Summary of text, from the cache when possible. Long texts are
+    summarized in full by map-reduce rather than truncated.
+    """
+    key = summary_key(llm_clients.model, summary_prompt(text))
+    # SQLite calls block, so they stay off the event loop
+    cached = await run_in_threadpool(summary_cache.get, key)
+    if cached is None:
+        cached = await summarizer.summarize(text)
+        await run_in_threadpool(summary_cache.put, key, cached)
+    return cached
+
+async def prewarm_summaries(timeline: MessageStore):
+    """
+    Summarizes every transcript in timeline that is not cached yet, one at a
+    time so user requests still get LLM slots.
+    """
+    seen = set()
+    count = 0
+    for _, msg in timeline.iter_messages():
+        tid = msg.get('transcript_id')
+        if not tid or tid in seen:
+            continue
+        seen.add(tid)
+        content = transcript_store.get_by_id(tid)
+        if not content:
+            continue
+        key = summary_key(llm_clients.model, summary_prompt(content))
+        if await run_in_threadpool(summary_cache.__contains__, key):
+            continue
+        try:
+            await generate_summary(content)
+            count += 1
+        except Exception as e:
+            print(f"Could not pre-warm summary for {tid}: {e}")
+    print(f"Pre-warmed {count} transcript summaries.")
+
 @app.post("/api/summary")
 async def summarize(request: SummaryRequest):
-    if not GROQ_API_KEY:
+    if not llm_clients:
         raise HTTPException(status_code=500, detail="GROQ_API_KEY not configured")
     
     try:
-        llm = ChatGroq(model="llama-3.3-70b-versatile", api_key=GROQ_API_KEY)
-        
-        prompt = (
-            "Please provide a concise and insightful summary of the following content. "
-            "If it's a conversation, highlight key points. "
-            "If it's a transcript, extract the main takeaways. "
-            "Keep it under 200 words.\n\n"
-            f"{request.text[:10000]}" # Limit context window just in case
-        )
-        
-        response = llm.invoke(prompt)
-        return {"summary": response.content}
+        return {"summary": await generate_summary(request.text)}
+    except LLMBusyError as e:
+        raise _llm_busy(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/summary/stream")
+async def summarize_stream(request: SummaryRequest):
+    """
+    Same as /api/summary, but streamed as server-sent events: one
+    data: {"token": ...} event per chunk as the model produces it, then
+    data: [DONE]. Failures after the stream has started arrive as
+    data: {"error": ...}.
+    """
+    if not llm_clients:
+        raise HTTPException(status_code=500, detail="GROQ_API_KEY not configured")
+
+    key = summary_key(llm_clients.model, summary_prompt(request.text))
+    cached = await run_in_threadpool(summary_cache.get, key)
+    if cached is not None:
+        async def cached_events():
+            yield f"data: {json.dumps({'token': cached})}\n\n"
+            yield "data: [DONE]\n\n"
+        return StreamingResponse(cached_events(), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache"})
+
+    # Map long inputs and take the slot for the final call before
+    # responding, so a full queue is still a plain 503
+    clients = llm_clients
+    cache = summary_cache
+    try:
+        prompt = await summarizer.final_prompt(request.text)
+        llm = await clients.acquire()
+    except LLMBusyError as e:
+        raise _llm_busy(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    released = False
+    def release():
+        # Runs from the stream, or afterwards if the stream never started
+        nonlocal released
+        if not released:
+            released = True
+            clients.release()
+
+    async def events():
+        pieces = []
+        try:
+            async for chunk in llm.astream(prompt):
+                if chunk.content:
+                    pieces.append(chunk.content)
+                    yield f"data: {json.dumps({'token': chunk.content})}\n\n"
+            await run_in_threadpool(cache.put, key, "".join(pieces))
+        except Exception as e:
+            yield f"data: {json.dumps({'error': str(e)})}\n\n"
+        finally:
+            release()
+        yield "data: [DONE]\n\n"
+
+    # X-Accel-Buffering stops nginx-style proxies from holding the stream back
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(release),
+    )
@@ -0,0 +1,154 @@
+import bisect
+import itertools
+from array import array
+
+# Message fields held as IDs into the string table
+INTERNED_FIELDS = ("type", "time", "sender", "video_url", "image_url", "transcript_id")
+MESSAGE_KEYS = {"type", "time", "sender", "content", "is_video", "video_url", "image_url",
+                "transcript_id", "transcript_length"}
+
+
+def day_key(date_str: str) -> str:
+    """Sortable YYYYMMDD key of a timeline date (MM/DD/YYYY)."""
+    return date_str[6:10] + date_str[0:2] + date_str[3:5]
+
+
+# Distinguishes successive builds of the same batch in response cache keys
+_versions = itertools.count(1)
+
+
+class StringTable:
+    """Each distinct string stored once; ID 0 is None."""
+
+    def __init__(self):
+        self.values = [None]
+        self.ids = {None: 0}
+
+    def add(self, value) -> int:
+        string_id = self.ids.get(value)
+        if string_id is None:
+            string_id = len(self.values)
+            self.ids[value] = string_id
+            self.values.append(value)
+        return string_id
+
+    def __len__(self):
+        return len(self.values)
+
+
+class MessageStore:
+    """
+    A parsed timeline packed into parallel arrays.
+
+    Senders, times, types and URLs repeat across thousands of messages, so
+    they are interned once and each message holds only their IDs. Message
+    contents are concatenated into one UTF-8 buffer addressed by offsets.
+    Nothing is kept per message as a Python object; days and messages are
+    rebuilt in the API's JSON shape ({"date", "messages": [...]}) only when
+    they are served.
+
+    Days behave like the list ChatParser.parse() returns: len(), indexing,
+    slicing and iteration all yield {"date", "messages"} dicts.
+    """
+
+    def __init__(self):
+        self.version = next(_versions)
+        self.dates = []
+        # Index of each day's first message, plus the total at the end
+        self.day_starts = array('I', [0])
+        self.strings = StringTable()
+        self.fields = {field: array('I') for field in INTERNED_FIELDS}
+        self.is_video = array('B')
+        self.transcript_length = array('q')  # -1 when not a transcript stub
+        self.content_offsets = array('Q', [0])
+        self.content = b""
+        # VideoIndex from the parse, if given; positions are message indices here
+        self.video_index = None
+
+    @classmethod
+    def from_timeline(cls, timeline: list, video_index=None) -> "MessageStore":
+        store = cls()
+        store.video_index = video_index
+        buffer = bytearray()
+        for day in timeline:
+            store.dates.append(day["date"])
+            for msg in day["messages"]:
+                unknown = msg.keys() - MESSAGE_KEYS
+                if unknown:
+                    raise ValueError(f"MessageStore cannot hold message fields {sorted(unknown)}")
+                for field in INTERNED_FIELDS:
+                    store.fields[field].append(store.strings.add(msg.get(field)))
+                store.is_video.append(1 if msg["is_video"] else 0)
+                store.transcript_length.append(msg.get("transcript_length", -1))
+                buffer += (msg["content"] or "").encode("utf-8")
+                store.content_offsets.append(len(buffer))
+            store.day_starts.append(len(store.is_video))
+        # bytes rather than bytearray: no over-allocation, and immutable
+        store.content = bytes(buffer)
+        return store
+
+    @property
+    def message_count(self) -> int:
+        return len(self.is_video)
+
+    def message(self, i: int) -> dict:
+        """Message i (counting across all days) in the API's shape."""
+        values = self.strings.values
+        fields = self.fields
+        msg = {
+            "type": values[fields["type"][i]],
+            "time": values[fields["time"][i]],
+            "sender": values[fields["sender"][i]],
+            "content": self.content[self.content_offsets[i]:self.content_offsets[i + 1]].decode("utf-8"),
+            "is_video": bool(self.is_video[i]),
+            "video_url": values[fields["video_url"][i]],
+            "image_url": values[fields["image_url"][i]],
+        }
+        transcript_id = values[fields["transcript_id"][i]]
+        if transcript_id is not None:
+            msg["transcript_id"] = transcript_id
+            msg["transcript_length"] = self.transcript_length[i]
+        return msg
+
+    def day_of(self, i: int) -> int:
+        """Index of the day message i belongs to."""
+        return bisect.bisect_right(self.day_starts, i) - 1
+
+    def message_at(self, i: int) -> tuple:
+        """(date, message) for message i."""
+        return self.dates[self.day_of(i)], self.message(i)
+
+    def iter_messages(self):
+        """Yields (date, message) for every message, in timeline order."""
+        for d, date in enumerate(self.dates):
+            for i in range(self.day_starts[d], self.day_starts[d + 1]):
+                yield date, self.message(i)
+
+    def day(self, d: int) -> dict:
+        return {
+            "date": self.dates[d],
+            "messages": [self.message(i) for i in range(self.day_starts[d], self.day_starts[d + 1])],
+        }
+
+    def __len__(self):
+        return len(self.dates)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self.day(d) for d in range(*key.indices(len(self.dates)))]
+        if key < 0:
+            key += len(self.dates)
+        if not 0 <= key < len(self.dates):
+            raise IndexError("day index out of range")
+        return self.day(key)
+
+    def __iter__(self):
+        for d in range(len(self.dates)):
+            yield self.day(d)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate size of the packed data (excluding the string table)."""
+        arrays = [self.day_starts, self.is_video, self.transcript_length, self.content_offsets,
+                  *self.fields.values()]
+        return len(self.content) + sum(a.itemsize * len(a) for a in arrays)
@@ -1,336 +1,344 @@
-import re
 import os
-import unicodedata
+import json
+import bisect
+import hashlib
 from datetime import datetime, timedelta
 from typing import List, Dict, Any
+from .tokenizer import (
+    MessageTokenizer, detect_file_date_order, extract_video_id, extract_video_url,
+)
+from .transcripts import TranscriptStore, transcript_id
+
+# Separator line used by exports that embed transcripts after the chat
+TRANSCRIPT_SEPARATOR = '================================================================'
+
+CHECKPOINT_VERSION = 2
+# Characters of a transcript kept inline when the timeline carries stubs
+TRANSCRIPT_PREVIEW_CHARS = 280
+# Bytes hashed at each end of the parsed prefix to detect a changed export
+CHECKPOINT_SAMPLE_BYTES = 64 * 1024
+
+class VideoIndex:
+    """
+    Where each YouTube video was shared in a parsed timeline.
+
+    Positions count messages across the whole timeline in order, the same
+    numbering MessageStore uses, so store.message(i) fetches a share.
+    """
+
+    def __init__(self):
+        self.videos = {}  # { video_id: {"first_shared", "shares", "positions"} }
+
+    @classmethod
+    def build(cls, timeline: list) -> "VideoIndex":
+        index = cls()
+        position = 0
+        for day in timeline:
+            for msg in day["messages"]:
+                # Transcripts repeat the video URL but are not shares
+                if msg["is_video"] and msg["type"] != "transcript":
+                    video_id = extract_video_id(msg["video_url"])
+                    if video_id:
+                        index.add(video_id, day["date"], position)
+                position += 1
+        return index
+
+    def add(self, video_id: str, date: str, position: int):
+        entry = self.videos.get(video_id)
+        if entry is None:
+            entry = self.videos[video_id] = {"first_shared": date, "shares": 0, "positions": []}
+        entry["shares"] += 1
+        entry["positions"].append(position)
+
+    def get(self, video_id: str) -> dict | None:
+        return self.videos.get(video_id)
+
+    def first_shared(self, video_id: str) -> str | None:
+        entry = self.videos.get(video_id)
+        return entry["first_shared"] if entry else None
+
+    def most_shared(self, n: int = 10) -> list:
+        """[(video_id, shares)] for the n most shared videos, earliest first on ties."""
+        ranked = sorted(self.videos.items(), key=lambda item: (-item[1]["shares"], item[1]["positions"][0]))
+        return [(video_id, entry["shares"]) for video_id, entry in ranked[:n]]
+
+    def __contains__(self, video_id: str) -> bool:
+        return video_id in self.videos
+
+    def __len__(self):
+        return len(self.videos)
+
 
 class ChatParser:
-    def __init__(self, chat_file: str, images_dir: str, original_chat_file: str = None):
+    def __init__(self, chat_file: str, images_dir: str, original_chat_file: str = None,
+                 transcript_file: str = None, transcript_store: TranscriptStore = None,
+                 transcript_stubs: bool = False):
         self.chat_file = chat_file
         self.images_dir = images_dir
+        # No longer read: video share dates come from the parse itself.
+        # Kept so existing callers passing it still work.
         self.original_chat_file = original_chat_file
+        # Assuming CWD is project root
+        self.transcript_store = transcript_store or TranscriptStore(
+            transcript_file or os.path.join(os.getcwd(), "youtube_transcripts.txt")
+        )
+        # With stubs, transcript messages carry an ID, length and preview and
+        # the body stays in the store (served by /api/transcripts/{id})
+        self.transcript_stubs = transcript_stubs
+        self.date_order = None
         # Updated to handle 2 or 4 digit years: \d{2,4}
         self.timestamp_pattern = r'^\[(\d{1,2}/\d{1,2}/\d{2,4}),' 
         self.image_pattern = r'(\d{4})-(\d{2})-(\d{2})'
-        self.video_date_map = self._build_video_date_map() if original_chat_file else {}
-        
-    def _build_video_date_map(self) -> dict:
+        # Filled in by parse(): where each YouTube video was shared
+        self.video_index = VideoIndex()
+
+    @property
+    def video_date_map(self) -> dict:
+        """{video_id: date it was first shared}, from the last parse()."""
+        return {video_id: entry["first_shared"] for video_id, entry in self.video_index.videos.items()}
+
+    def extract_video_url(self, text: str) -> str | None:
+        return extract_video_url(text)
+
+    def _iter_lines(self, start: int = 0):
         """
-        Scans the original WhatsApp export (_chat.txt) to find when YouTube links 
-        were actually shared. Returns a map of {video_id: date_string}.
+        Yields (byte_offset, line) for the chat section of the export, one line
+        at a time, stopping at the first transcript separator (the old
+        sections[0] split). Offsets let a later run resume mid-file.
         """
-        date_map = {}
-        if not self.original_chat_file or not os.path.exists(self.original_chat_file):
-            print(f"Warning: Original chat file not found at {self.original_chat_file}")
-            return date_map
-            
+        separator = TRANSCRIPT_SEPARATOR.encode('utf-8')
+        with open(self.chat_file, 'rb') as f:
+            f.seek(start)
+            offset = start
+            for physical_line in f:
+                if separator in physical_line:
+                    # Everything after the separator is embedded transcript text
+                    return
+                # splitlines() also breaks on unicode separators (e.g. U+2028)
+                for line in physical_line.decode('utf-8').splitlines():
+                    yield offset, line
+                offset += len(physical_line)
+
+    def _iter_records(self, start: int = 0):
+        """Yields (header_offset, message) pairs from start onwards."""
+        if self.date_order is None:
+            # Date order (M/D vs D/M) is decided once per file, not per line
+            self.date_order = detect_file_date_order(self.chat_file)
+        tokenizer = MessageTokenizer(self.date_order)
+        yield from tokenizer.tokenize(self._iter_lines(start))
+
+    def iter_messages(self):
+        """
+        Streams the chat export line by line and yields one message record at a
+        time. Only the message currently being assembled is held in memory, so
+        memory use is bounded regardless of export size.
+        """
+        for _, message in self._iter_records():
+            yield message
+
+    def _fingerprint(self, offset: int) -> str:
+        """
+        Hashes the start of the export and the bytes just before offset. Enough
+        to tell an appended export from a different or edited one without
+        re-reading the whole history.
+        """
+        digest = hashlib.sha256()
+        with open(self.chat_file, 'rb') as f:
+            digest.update(f.read(min(offset, CHECKPOINT_SAMPLE_BYTES)))
+            tail_start = max(0, offset - CHECKPOINT_SAMPLE_BYTES)
+            f.seek(tail_start)
+            digest.update(f.read(offset - tail_start))
+        return digest.hexdigest()
+
+    def _load_checkpoint(self, checkpoint_file: str) -> dict | None:
+        if not os.path.exists(checkpoint_file):
+            return None
         try:
-            with open(self.original_chat_file, 'r', encoding='utf-8') as f:
-                for line in f:
-                    # Look for YouTube links
-                    if "youtu" in line and "http" in line:
-                        # Extract Date: [9/28/25, ...
-                        # Regex for standard WhatsApp export date: [M/D/YY, ...
-                        date_match = re.search(r'\[(\d{1,2}/\d{1,2}/\d{2,4}),', line)
-                        if date_match:
-                            date_str = date_match.group(1)
-                            # Normalize year to 4 digits if needed (25 -> 2025)
-                            parts = date_str.split('/')
-                            if len(parts) == 3 and len(parts[2]) == 2:
-                                date_str = f"{parts[0]}/{parts[1]}/20{parts[2]}"
-                                
-                            # Extract Video ID
-                            vid_id_match = re.search(r'(?:v=|youtu\.be/)([\w\-]+)', line)
-                            if vid_id_match:
-                                video_id = vid_id_match.group(1)
-                                date_map[video_id] = date_str
-        except Exception as e:
-            print(f"Error building video date map: {e}")
-            
-        print(f"Built video date map with {len(date_map)} entries.")
-        return date_map
+            with open(checkpoint_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            store = self.transcript_store
+            valid = (
+                state.get("version") == CHECKPOINT_VERSION
+                and os.path.getsize(self.chat_file) >= state["offset"]
+                and state["fingerprint"] == self._fingerprint(state["offset"])
+                # Transcript edits change bodies already baked into the groups
+                and state["transcripts"] == (store.signature if store.exists() else None)
+                and state["transcript_stubs"] == self.transcript_stubs
+            )
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring unreadable checkpoint {checkpoint_file}: {e}")
+            return None
 
-    def extract_video_url(self, text: str) -> str | None:
-        if not text:
+        if not valid:
+            print("Checkpoint does not match the export, re-parsing from scratch.")
             return None
-        
-        # More robust regex for YouTube URLs
-        # Matches: youtube.com/watch?v=ID, youtu.be/ID, youtube.com/embed/ID
-        youtube_regex = r'https?://(?:www\.)?(?:youtube\.com/(?:watch\?v=|embed/)|youtu\.be/)([\w\-]+)'
-        match = re.search(youtube_regex, text)
-        if match:
-            video_id = match.group(1)
-            # Normalize to standard YouTube watch URL for better ReactPlayer compatibility
-            return f"https://www.youtube.com/watch?v={video_id}"
-            
-        # Fallback for explicit URL: pattern
-        if "URL:" in text:
-            try:
-                idx = text.find("URL:")
-                possible_url = text[idx+4:].strip().split()[0]
-                if "http" in possible_url:
-                    # Try to extract video ID and normalize
-                    vid_match = re.search(r'(?:v=|youtu\.be/|embed/)([\w\-]+)', possible_url)
-                    if vid_match:
-                        return f"https://www.youtube.com/watch?v={vid_match.group(1)}"
-                    return possible_url
-            except:
-                pass
-        
-        return None
+        return state
 
-    def parse(self):
-        grouped_data = {} # { "date_str": [message_objects] }
-        
+    def _save_checkpoint(self, checkpoint_file: str, offset: int, days: dict):
+        store = self.transcript_store
+        state = {
+            "version": CHECKPOINT_VERSION,
+            "offset": offset,
+            "fingerprint": self._fingerprint(offset),
+            "date_order": self.date_order,
+            "transcripts": store.signature if store.exists() else None,
+            "transcript_stubs": self.transcript_stubs,
+            "days": days,
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(checkpoint_file)), exist_ok=True)
+        tmp_file = checkpoint_file + ".tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_file, checkpoint_file)
+
+    def _inject_transcripts(self, all_messages: list) -> int:
+        """Appends a transcript message after every shared video that has one."""
+        # Map video IDs to message indices (store ALL occurrences, not just first)
+        video_map = {}
+        for i, msg in enumerate(all_messages):
+            if msg["is_video"] and msg["video_url"]:
+                video_id = extract_video_id(msg["video_url"])
+                if video_id:
+                    if video_id not in video_map:
+                        video_map[video_id] = []
+                    video_map[video_id].append(i)
+
+        count_external = 0
+        if not video_map:
+            return count_external
+
+        # Join transcripts from the indexed store, loading only the videos
+        # that were actually shared in this chat
+        store = self.transcript_store
+        if not store.exists():
+            return count_external
         try:
-            with open(self.chat_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # Split by the separator used for transcripts
-            sections = content.split('================================================================')
-            main_chat_lines = sections[0].splitlines()
-            
-            current_date_str = None
-            
-            # Regex to parse the chat line: [Date, Time] Sender: Message
-            # Handles 2-digit (25) and 4-digit (2025) years
-            line_pattern = re.compile(r'^\[(\d{1,2}/\d{1,2}/\d{2,4}),\s*(\d{1,2}:\d{2}:\d{2}\s*[APap][Mm])\]\s*(.*?):\s*(.*)$')
-            
-            def parse_datetime(date_s, time_s):
-                dt_str = f"{date_s} {time_s}"
-                formats = [
-                    "%m/%d/%y %I:%M:%S %p",   # 9/1/25 5:59:40 PM
-                    "%m/%d/%Y %I:%M:%S %p",   # 9/1/2025 5:59:40 PM
-                    "%d/%m/%y %I:%M:%S %p",   # DD/MM/YY fallback
-                    "%d/%m/%Y %I:%M:%S %p"
-                ]
-                for fmt in formats:
-                    try:
-                        return datetime.strptime(dt_str, fmt)
-                    except ValueError:
-                        continue
-                return datetime.now() # Fallback
-
-            all_messages = []
-
-            for line in main_chat_lines:
-                line = line.strip()
-                # Remove LTR/RTL marks
-                line = line.replace('\u200e', '').replace('\u200f', '')
-                
-                if not line:
+            # File order keeps the injection order of the old full scan
+            for video_id in store.video_ids():
+                if video_id not in video_map:
                     continue
-                
-                match = line_pattern.match(line)
-                if match:
-                    # New Message Start
-                    date_str, time_str, sender, msg_content = match.groups()
-                    dt_obj = parse_datetime(date_str, time_str)
-                    
-                    # Normalize date_str to MM/DD/YYYY for grouping key consistency
-                    # (Uses the parsed dt_obj to reconstruct)
-                    normalized_date_str = dt_obj.strftime("%m/%d/%Y")
-                    
-                    # Check for attachment
-                    attachment_match = re.search(r'<attached:\s*(.*?)>', msg_content)
-                    
-                    msg_type = "text"
-                    url = None
-                    file_path = None
-                    
-                    if attachment_match:
-                        filename = attachment_match.group(1).strip()
-                        ext = os.path.splitext(filename)[1].lower()
-                        if ext in ['.jpg', '.jpeg', '.png', '.webp', '.gif']:
-                            msg_type = "image"
-                            file_path = f"/static/{filename}"
-                        elif ext in ['.mp4', '.mov']:
-                            msg_type = "video_file"
-                            file_path = f"/static/{filename}"
-                        
-                        # Remove attachment tag from content
-                        msg_content = msg_content.replace(attachment_match.group(0), "").strip()
-
-                    else:
-                        # Skip system messages
-                        # Clean invisible control characters
-                        msg_content = "".join(ch for ch in msg_content if unicodedata.category(ch)[0] != "C")
-                        
-                        # Skip system messages - Aggressive Filter
-                        lower_content = msg_content.lower()
-                        if "joined using a group" in lower_content or "joined using this group" in lower_content:
-                             continue
-                        if "security code changed" in lower_content:
-                             continue
-                        if "added" in lower_content:
-                            # Check for patterns like "added +1..." or "added ~..." or "added you"
-                            if re.search(r'added\s+[\+~]', msg_content) or "added you" in lower_content:
-                                continue
-                        if lower_content.strip() == "left":
-                            continue
-
-                        url = self.extract_video_url(msg_content)
-                    
-                    message_obj = {
-                        "type": msg_type,
-                        "time_obj": dt_obj, 
-                        "time": time_str, 
-                        "sender": sender.strip(),
-                        "content": msg_content if msg_content else (file_path if file_path else ""), 
-                        "is_video": True if url else False,
-                        "video_url": url,
-                        "image_url": file_path
-                    }
-                    
-                    all_messages.append(message_obj)
-                    current_date_str = main_chat_lines # Just reference, logic uses dt_obj
-
-                else:
-                    # Continuation of previous message
-                    if all_messages:
-                        # Check if this NEW line has a video URL
-                        new_line_url = self.extract_video_url(line)
-                        last_msg = all_messages[-1]
-                        
-                        # If previous message ALREADY has a video, and this line has a DIFFERENT video
-                        if last_msg["is_video"] and new_line_url and new_line_url != last_msg["video_url"]:
-                            # Create a new message for this video to allow multiple videos in one "block"
-                            split_msg = last_msg.copy()
-                            split_msg["content"] = line
-                            split_msg["video_url"] = new_line_url
-                            split_msg["is_video"] = True
-                            split_msg["image_url"] = None
-                            # Offset time slightly to preserve order
-                            split_msg["time_obj"] = last_msg["time_obj"] + timedelta(milliseconds=100)
-                            
-                            all_messages.append(split_msg)
-                        else:
-                            # Standard continuation
-                            all_messages[-1]["content"] += "\n" + line
-                            # Re-check for URL if not found yet
-                            if not all_messages[-1]["is_video"]:
-                                url = self.extract_video_url(all_messages[-1]["content"])
-                                if url:
-                                    all_messages[-1]["is_video"] = True
-                                    all_messages[-1]["video_url"] = url
-
-            # Map video IDs to message indices (store ALL occurrences, not just first)
-            video_map = {}
-            for i, msg in enumerate(all_messages):
-                if msg["is_video"] and msg["video_url"]:
-                    vid_match = re.search(r'(?:v=|youtu\.be/|embed/)([\w\-]+)', msg["video_url"])
-                    if vid_match:
-                        video_id = vid_match.group(1)
-                        if video_id not in video_map:
-                            video_map[video_id] = []
-                        video_map[video_id].append(i)
-
-            # Process Transcripts from separate file if not found in sections
-            transcript_source = sections[1:] if len(sections) > 1 else []
-            
-            # Process Transcripts from separate file if not found in sections
-            transcript_source = sections[1:] if len(sections) > 1 else []
-            
-            # Check for external transcript file
-            # Assuming CWD is project root
-            external_transcript_file = os.path.join(os.getcwd(), "youtube_transcripts.txt")
-            
-            if len(transcript_source) == 0:
-                print(f"Checking for transcript file at: {external_transcript_file}")
-            if os.path.exists(external_transcript_file):
-                print("Reading external transcripts...")
-                try:
-                    with open(external_transcript_file, 'r', encoding='utf-8') as tf:
-                        t_lines = tf.readlines()
-                    
-                    current_vid_id = None
-                    current_content = []
-                    count_external = 0
-                    
-                    def flush_transcript():
-                        nonlocal count_external
-                        if current_vid_id and current_content:
-                            clean_content = "".join(current_content).strip()
-                            # Check if content is valid
-                            if not clean_content: return
-                            
-                            if current_vid_id in video_map:
-                                # Inject transcript for EACH occurrence of this video
-                                for target_msg_idx in video_map[current_vid_id]:
-                                    ref_msg = all_messages[target_msg_idx]
-                                    
-                                    transcript_msg = {
-                                        "type": "transcript", 
-                                        "time_obj": ref_msg["time_obj"] + timedelta(seconds=1), 
-                                        "time": "Transcript",
-                                        "sender": "Archive Bot",
-                                        "content": clean_content,
-                                        "is_video": False,
-                                        "video_url": f"https://www.youtube.com/watch?v={current_vid_id}",
-                                        "image_url": None
-                                    }
-                                    all_messages.append(transcript_msg)
-                                    count_external += 1
-                            else:
-                                pass # print(f"Missed match for ID: {current_vid_id}")
-
-                    for line in t_lines:
-                        # Check for URL line which signals start of new video context
-                        if "URL:" in line:
-                            # Flush previous context
-                            flush_transcript()
-                            
-                            # Start new context
-                            current_content = []
-                            current_vid_id = None
-                            
-                            vid_match = re.search(r'(?:v=|youtu\.be/|embed/)([\w\-]+)', line)
-                            if vid_match:
-                                current_vid_id = vid_match.group(1).strip()
-                        
-                        elif "[Video Transcript]" in line:
-                            # Just a header, usually precedes URL. If singular, flush prev.
-                            pass
-                            
-                        elif "=======" in line:
-                            # Separator, ignore
-                            pass
-                            
-                        else:
-                            # Content line
-                            if current_vid_id:
-                                current_content.append(line)
-                                
-                    # Flush last block
-                    flush_transcript()
-                    
-                except Exception as e:
-                    print(f"Error reading transcript file: {e}")
+                for block, clean_content in enumerate(store.get_all(video_id)):
+                    stub = None
+                    if self.transcript_stubs:
+                        stub = {
+                            "transcript_id": transcript_id(video_id, block),
+                            "transcript_length": len(clean_content),
+                        }
+                        clean_content = clean_content[:TRANSCRIPT_PREVIEW_CHARS]
+
+                    # Inject transcript for EACH occurrence of this video
+                    for target_msg_idx in video_map[video_id]:
+                        ref_msg = all_messages[target_msg_idx]
+
+                        transcript_msg = {
+                            "type": "transcript",
+                            "time_obj": ref_msg["time_obj"] + timedelta(seconds=1),
+                            "time": "Transcript",
+                            "sender": "Archive Bot",
+                            "content": clean_content,
+                            "is_video": False,
+                            "video_url": f"https://www.youtube.com/watch?v={video_id}",
+                            "image_url": None
+                        }
+                        if stub:
+                            transcript_msg.update(stub)
+                        all_messages.append(transcript_msg)
+                        count_external += 1
+        except Exception as e:
+            print(f"Error reading transcript file: {e}")
+        return count_external
+
+    def _merge_into_days(self, days: dict, all_messages: list) -> int:
+        """
+        Injects transcripts for all_messages, then files every message under
+        its date in days ({ "date_str": {"keys": [...], "messages": [...]} }),
+        keeping each day ordered by time. Returns the transcripts injected.
+        """
+        count_external = self._inject_transcripts(all_messages)
+
+        # Sort all messages by time
+        all_messages.sort(key=lambda x: x["time_obj"])
+
+        # Position of each video in the transcript file, so transcripts that
+        # share a timestamp keep file order across incremental runs too
+        video_ranks = {}
+        if count_external:
+            video_ranks = {vid: i for i, vid in enumerate(self.transcript_store.video_ids())}
+
+        # Group by Date
+        for msg in all_messages:
+            d_str = msg["time_obj"].strftime("%m/%d/%Y") # Key format
+            # Chat messages sort before transcripts that share a timestamp
+            sort_key = msg["time_obj"].isoformat(timespec='microseconds')
+            if msg["type"] == "transcript":
+                rank = video_ranks.get(extract_video_id(msg["video_url"]), 0)
+                sort_key += f"|1|{rank:06d}"
             else:
-                print("Transcript file not found!")
-                
+                sort_key += "|0"
+
+            if d_str not in days:
+                days[d_str] = {"keys": [], "messages": []}
+            day = days[d_str]
+
+            # Messages are owned by this parse, so strip the sort key in place
+            # rather than copying every record a second time
+            final_msg = msg
+            del final_msg["time_obj"]
+
+            # Compatibility with frontend image rendering
+            if final_msg["type"] == "image":
+                final_msg["content"] = final_msg["image_url"]
+
+            # Note: Removed transcript post-processing that was hiding legitimate forwarded messages
+
+            if not day["keys"] or sort_key >= day["keys"][-1]:
+                day["keys"].append(sort_key)
+                day["messages"].append(final_msg)
+            else:
+                # Late message (e.g. appended out of order): insert in place
+                i = bisect.bisect_right(day["keys"], sort_key)
+                day["keys"].insert(i, sort_key)
+                day["messages"].insert(i, final_msg)
+
+        return count_external
+
+    def parse(self, checkpoint_file: str = None):
+        """
+        Parses the export into a list of {"date", "messages"} days.
+
+        With checkpoint_file, parsing resumes from the state saved by the last
+        run when the export has only been appended to, so only the new tail is
+        tokenized. A fresh checkpoint is written at the end either way. The
+        checkpoint stops before the last message, since later exports can
+        still add continuation lines to it.
+        """
+        days = {} # { "date_str": {"keys": [...], "messages": [...]} }
+        print(f"Checking for transcript file at: {self.transcript_store.transcript_file}")
+        if not self.transcript_store.exists():
+            print("Transcript file not found!")
+
+        try:
+            state = self._load_checkpoint(checkpoint_file) if checkpoint_file else None
+            start = 0
+            if state:
+                start = state["offset"]
+                days = state["days"]
+                self.date_order = state["date_order"]
+                print(f"Resuming from checkpoint at byte {start} ({len(days)} days already parsed).")
+
+            records = list(self._iter_records(start))
+            # Everything from the last message header on is re-read next time
+            tail_offset = records[-1][0] if records else start
+            settled = [msg for offset, msg in records if offset < tail_offset]
+            tail = [msg for offset, msg in records if offset >= tail_offset]
+            del records
+
+            count_external = self._merge_into_days(days, settled)
+            if checkpoint_file:
+                self._save_checkpoint(checkpoint_file, tail_offset, days)
+            count_external += self._merge_into_days(days, tail)
+
             print(f"Injected {count_external} transcripts from external file.")
-                
-            # Sort all messages by time
-            all_messages.sort(key=lambda x: x["time_obj"])
-            
-            # Group by Date
-            for msg in all_messages:
-                d_str = msg["time_obj"].strftime("%m/%d/%Y") # Key format
-                
-                if d_str not in grouped_data:
-                    grouped_data[d_str] = []
-                
-                final_msg = msg.copy()
-                del final_msg["time_obj"]
-                
-                # Compatibility with frontend image rendering
-                if final_msg["type"] == "image":
-                    final_msg["content"] = final_msg["image_url"]
-                
-                # Note: Removed transcript post-processing that was hiding legitimate forwarded messages
-
-                grouped_data[d_str].append(final_msg)
 
         except Exception as e:
             print(f"Error parse chat file: {e}")
@@ -338,7 +346,7 @@ class ChatParser:
             traceback.print_exc()
 
         # Convert to list and sort days
-        timeline = [{"date": k, "messages": v} for k, v in grouped_data.items()]
+        timeline = [{"date": k, "messages": v["messages"]} for k, v in days.items()]
         
         def parse_date_key(d_str):
             try:
@@ -347,7 +355,10 @@ class ChatParser:
                 return datetime.max
         
         timeline.sort(key=lambda x: parse_date_key(x["date"]))
-        
+
+        # Shares are indexed from the parsed messages, not a second read of the export
+        self.video_index = VideoIndex.build(timeline)
+        print(f"Indexed {len(self.video_index)} shared videos.")
         return timeline
 
     def clean_transcript(self, text: str) -> str:
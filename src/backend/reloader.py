@@ -0,0 +1,62 @@
+import os
+import threading
+
+# Seconds between checks for changed exports
+POLL_INTERVAL = 5.0
+
+
+def file_signature(path: str):
+    """(size, mtime_ns) of path, or None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_size, st.st_mtime_ns)
+
+
+class PollingWatcher:
+    """
+    Polls for changes on a daemon thread and rebuilds when they settle.
+
+    check() returns what has changed since the data being served was built,
+    e.g. {path: signature}; an empty result means nothing did. on_change is
+    only called once two consecutive polls agree, so a file that is still
+    being copied in is not picked up half-written. Polling rather than
+    inotify keeps this working on network drives and Windows checkouts, and
+    costs one stat() per watched file per interval.
+    """
+
+    def __init__(self, check, on_change, interval: float = POLL_INTERVAL):
+        self.check = check
+        self.on_change = on_change
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="export-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def poll(self, previous: dict) -> dict:
+        """One check; returns the changes seen, to pass back in next time."""
+        changes = self.check()
+        if changes and changes == previous:
+            self.on_change(changes)
+            return {}
+        return changes
+
+    def _run(self):
+        previous = {}
+        while not self._stop.wait(self.interval):
+            try:
+                previous = self.poll(previous)
+            except Exception as e:
+                # Keep serving the current data and try again next time
+                print(f"Reload failed: {e}")
+                previous = {}
@@ -0,0 +1,95 @@
+import gzip
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from fastapi import Request, Response
+
+try:
+    import brotli # Optional: pip install brotli
+except ImportError:
+    brotli = None
+
+
+class EncodedBody:
+    """
+    A JSON payload serialized and compressed once, ready to be served many
+    times. The strong ETag is derived from the identity bytes; compressed
+    variants get a suffix so each representation has its own validator.
+    """
+
+    def __init__(self, payload):
+        self.identity = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self.gzip = gzip.compress(self.identity, compresslevel=9, mtime=0)
+        self.br = brotli.compress(self.identity) if brotli else None
+        self.tag = hashlib.sha256(self.identity).hexdigest()[:32]
+
+    def etag(self, encoding: str = None) -> str:
+        return f'"{self.tag}-{encoding}"' if encoding else f'"{self.tag}"'
+
+    def not_modified(self, if_none_match: str | None) -> bool:
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        for candidate in if_none_match.split(","):
+            candidate = candidate.strip()
+            if candidate.startswith("W/"):
+                candidate = candidate[2:]
+            # Any representation of the same payload is still current
+            if candidate.strip('"').split("-")[0] == self.tag:
+                return True
+        return False
+
+    def respond(self, request: Request, headers: dict = None) -> Response:
+        """
+        Serves the best encoding the client accepts, or 304 when the client's
+        ETag still matches.
+        """
+        headers = dict(headers or {})
+        headers["Vary"] = "Accept-Encoding"
+        # Clients may cache, but must revalidate with the ETag
+        headers.setdefault("Cache-Control", "no-cache")
+
+        accepted = request.headers.get("accept-encoding", "").lower()
+        if self.br is not None and "br" in accepted:
+            encoding, body = "br", self.br
+        elif "gzip" in accepted:
+            encoding, body = "gzip", self.gzip
+        else:
+            encoding, body = None, self.identity
+        headers["ETag"] = self.etag(encoding)
+
+        if self.not_modified(request.headers.get("if-none-match")):
+            return Response(status_code=304, headers=headers)
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return Response(content=body, media_type="application/json", headers=headers)
+
+
+class EncodedBodyCache:
+    """Small LRU of encoded responses keyed by request parameters."""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, build):
+        """Returns the cached body for key, encoding build() on a miss."""
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+                return body
+        # Encode outside the lock; a concurrent miss just does the work twice
+        body = EncodedBody(build())
+        with self._lock:
+            self._entries[key] = body
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return body
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
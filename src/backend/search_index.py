@@ -0,0 +1,179 @@
+import re
+import bisect
+from .message_store import MessageStore
+
+TOKEN_PATTERN = re.compile(r'\w+')
+PHRASE_PATTERN = re.compile(r'"([^"]*)"')
+
+
+def tokenize(text: str) -> list:
+    return TOKEN_PATTERN.findall(text.lower()) if text else []
+
+
+def _positions(tokens: list) -> dict:
+    """Maps each term to the positions it occurs at in tokens."""
+    positions = {}
+    for i, term in enumerate(tokens):
+        if term in positions:
+            positions[term].append(i)
+        else:
+            positions[term] = [i]
+    return positions
+
+
+class SearchIndex:
+    """
+    Positional inverted index over a parsed timeline, built once at startup.
+
+    Message content (transcripts included) and senders are indexed as two
+    fields. Transcript stubs are indexed with their full body, read from the
+    transcript store. Queries are a mix of:
+      - terms:    vegan diet     (every term must match)
+      - prefixes: nutri*         (any indexed term starting with "nutri")
+      - phrases:  "whole food"   (consecutive terms in the same field)
+    so a lookup touches only the postings of the query terms instead of
+    lower-casing every message on every request.
+    """
+
+    def __init__(self):
+        self.docs = []  # [(date, message)], doc ID is the position
+        # When built from a MessageStore, doc IDs are message positions in
+        # it instead, so the index holds no message objects of its own
+        self.store = None
+        # term -> {doc_id: [positions]}, one map per field
+        self.content_postings = {}
+        self.sender_postings = {}
+        self._vocabulary = None  # sorted terms, built on first prefix query
+
+    @classmethod
+    def build(cls, timeline: list, transcript_store=None) -> "SearchIndex":
+        index = cls()
+        # Transcripts are repeated for every share of a video, so each
+        # distinct text (or transcript ID) is tokenized once
+        tokenized = {}
+        if isinstance(timeline, MessageStore):
+            index.store = timeline
+            for doc_id, (_, msg) in enumerate(timeline.iter_messages()):
+                index._index(doc_id, msg, tokenized, transcript_store)
+            return index
+
+        for day in timeline:
+            for msg in day['messages']:
+                index.add(day['date'], msg, tokenized, transcript_store)
+        return index
+
+    def __len__(self):
+        return self.store.message_count if self.store is not None else len(self.docs)
+
+    def _doc(self, doc_id: int) -> tuple:
+        return self.store.message_at(doc_id) if self.store is not None else self.docs[doc_id]
+
+    def add(self, date: str, msg: dict, tokenized: dict = None, transcript_store=None):
+        doc_id = len(self.docs)
+        self.docs.append((date, msg))
+        self._index(doc_id, msg, tokenized, transcript_store)
+
+    def _index(self, doc_id: int, msg: dict, tokenized: dict = None, transcript_store=None):
+        self._vocabulary = None
+
+        content = msg['content'] if isinstance(msg['content'], str) else ""
+        sender = msg['sender'] if isinstance(msg['sender'], str) else ""
+        key = content
+        if msg.get('transcript_id') and transcript_store is not None:
+            key = ("transcript", msg['transcript_id'])
+
+        if tokenized is not None and key in tokenized:
+            content_positions = tokenized[key]
+        else:
+            if isinstance(key, tuple):
+                content = transcript_store.get_by_id(msg['transcript_id']) or content
+            content_positions = _positions(tokenize(content))
+            if tokenized is not None:
+                tokenized[key] = content_positions
+
+        for postings, positions in ((self.content_postings, content_positions),
+                                    (self.sender_postings, _positions(tokenize(sender)))):
+            for term, term_positions in positions.items():
+                if term in postings:
+                    postings[term][doc_id] = term_positions
+                else:
+                    postings[term] = {doc_id: term_positions}
+
+    def _term_docs(self, term: str) -> set:
+        return set(self.content_postings.get(term, ())) | set(self.sender_postings.get(term, ()))
+
+    def _prefix_docs(self, prefix: str) -> set:
+        if self._vocabulary is None:
+            self._vocabulary = sorted(set(self.content_postings) | set(self.sender_postings))
+        docs = set()
+        i = bisect.bisect_left(self._vocabulary, prefix)
+        while i < len(self._vocabulary) and self._vocabulary[i].startswith(prefix):
+            docs |= self._term_docs(self._vocabulary[i])
+            i += 1
+        return docs
+
+    def _phrase_docs(self, terms: list) -> set:
+        if len(terms) == 1:
+            return self._term_docs(terms[0])
+
+        docs = set()
+        for postings in (self.content_postings, self.sender_postings):
+            term_postings = [postings.get(term) for term in terms]
+            if not all(term_postings):
+                continue
+            # Only documents holding every term can hold the phrase
+            candidates = set(min(term_postings, key=len))
+            for p in term_postings:
+                candidates &= p.keys()
+            for doc_id in candidates:
+                later = [set(p[doc_id]) for p in term_postings[1:]]
+                if any(all(start + k + 1 in positions for k, positions in enumerate(later))
+                       for start in term_postings[0][doc_id]):
+                    docs.add(doc_id)
+        return docs
+
+    def match(self, query: str) -> list:
+        """Returns the sorted IDs of documents matching every query clause."""
+        clauses = []
+        for phrase in PHRASE_PATTERN.findall(query):
+            terms = tokenize(phrase)
+            if terms:
+                clauses.append(("phrase", terms))
+
+        for word in PHRASE_PATTERN.sub(" ", query).split():
+            terms = tokenize(word)
+            if terms and word.endswith("*"):
+                # Only the last token of "foo-bar*" is a prefix
+                clauses.extend(("term", term) for term in terms[:-1])
+                clauses.append(("prefix", terms[-1]))
+            else:
+                clauses.extend(("term", term) for term in terms)
+
+        if not clauses:
+            return []
+
+        matched = None
+        for kind, value in clauses:
+            if kind == "phrase":
+                docs = self._phrase_docs(value)
+            elif kind == "prefix":
+                docs = self._prefix_docs(value)
+            else:
+                docs = self._term_docs(value)
+            matched = docs if matched is None else matched & docs
+            if not matched:
+                return []
+        return sorted(matched)
+
+    def search(self, query: str) -> list:
+        results = []
+        for doc_id in self.match(query):
+            date, msg = self._doc(doc_id)
+            txt = msg['content'] if isinstance(msg['content'], str) else ""
+            results.append({
+                "date": date,
+                "time": msg['time'],
+                "sender": msg['sender'],
+                "snippet": txt[:200] + "..."
+            })
+        return results
@@ -0,0 +1,107 @@
+import os
+import json
+from .responses import EncodedBody
+from .message_store import day_key
+
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 1
+# Hex digits of the content hash kept in shard file names
+HASH_LENGTH = 12
+
+
+def _write_shard(out_dir: str, subdir: str, name: str, payload, compress: bool) -> str:
+    """
+    Writes payload as minified JSON under a content-hashed name and returns
+    its path relative to out_dir. An unchanged shard keeps its name, so it
+    is neither rewritten nor evicted from CDN caches by a rebuild.
+    """
+    body = EncodedBody(payload)
+    rel_path = f"{subdir}/{name}.{body.tag[:HASH_LENGTH]}.json"
+    path = os.path.join(out_dir, rel_path)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(body.identity)
+    if compress:
+        for ext, data in (("gz", body.gzip), ("br", body.br)):
+            if data is not None and not os.path.exists(f"{path}.{ext}"):
+                with open(f"{path}.{ext}", 'wb') as f:
+                    f.write(data)
+    return rel_path
+
+
+def _prune(out_dir: str, subdir: str, keep: set):
+    directory = os.path.join(out_dir, subdir)
+    for name in os.listdir(directory):
+        base = name[:-3] if name.endswith((".gz", ".br")) else name
+        if f"{subdir}/{base}" not in keep:
+            os.remove(os.path.join(directory, name))
+
+
+def export_static_timeline(timeline: list, out_dir: str, transcript_store=None,
+                           compress: bool = False) -> dict:
+    """
+    Writes a parsed timeline as static files for the frontend:
+
+        manifest.json                     days in order, with their shard files
+        days/<YYYYMMDD>.<hash>.json       one {"date", "messages"} per day
+        transcripts/<id>.<hash>.json      one per transcript stub, same shape
+                                          as /api/transcripts/{id}
+
+    The timeline should be parsed with transcript_stubs=True so days carry
+    only transcript previews. Shards are minified and named by content
+    hash; with compress, .gz (and .br when brotli is installed) copies are
+    written next to them. Shards no longer referenced are removed.
+    Returns the manifest.
+    """
+    manifest = {"version": MANIFEST_VERSION, "days": [], "transcripts": {}}
+    written = set()
+
+    for day in timeline:
+        rel_path = _write_shard(out_dir, "days", day_key(day["date"]), day, compress)
+        written.add(rel_path)
+        manifest["days"].append({
+            "date": day["date"],
+            "file": rel_path,
+            "messages": len(day["messages"]),
+        })
+
+        for msg in day["messages"]:
+            tid = msg.get("transcript_id")
+            if not tid or tid in manifest["transcripts"] or transcript_store is None:
+                continue
+            content = transcript_store.get_by_id(tid)
+            if content is None:
+                continue
+            payload = {"id": tid, "video_url": msg["video_url"], "content": content}
+            rel_path = _write_shard(out_dir, "transcripts", tid, payload, compress)
+            written.add(rel_path)
+            manifest["transcripts"][tid] = rel_path
+
+    # The manifest is the only file rewritten in place. It goes after the
+    # shards it points at and before stale shards are removed, so it is
+    # never ahead of or behind the files on disk
+    os.makedirs(out_dir, exist_ok=True)
+    tmp_file = os.path.join(out_dir, MANIFEST_FILE + ".tmp")
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_file, os.path.join(out_dir, MANIFEST_FILE))
+
+    for subdir in ("days", "transcripts"):
+        if os.path.isdir(os.path.join(out_dir, subdir)):
+            _prune(out_dir, subdir, written)
+    return manifest
+
+
+def inline_transcripts(timeline: list, transcript_store) -> list:
+    """
+    The timeline with transcript stubs replaced by their full bodies, i.e.
+    what parse() returns without transcript_stubs. Modifies it in place.
+    """
+    for day in timeline:
+        for msg in day["messages"]:
+            tid = msg.pop("transcript_id", None)
+            msg.pop("transcript_length", None)
+            if tid:
+                msg["content"] = transcript_store.get_by_id(tid) or msg["content"]
+    return timeline
@@ -0,0 +1,125 @@
+import asyncio
+from fastapi.concurrency import run_in_threadpool
+from .summary_cache import summary_key
+
+# Inputs up to this size are summarized in one prompt
+MAP_CHUNK_CHARS = 8000
+# Chunks of one input summarized at the same time
+MAP_CONCURRENCY = 4
+
+
+def summary_prompt(text: str) -> str:
+    return (
+        "Please provide a concise and insightful summary of the following content. "
+        "If it's a conversation, highlight key points. "
+        "If it's a transcript, extract the main takeaways. "
+        "Keep it under 200 words.\n\n"
+        f"{text}"
+    )
+
+
+def map_prompt(text: str) -> str:
+    return (
+        "The following is one part of a longer conversation or video transcript. "
+        "List its key points and takeaways in a few sentences, "
+        "without an introduction.\n\n"
+        f"{text}"
+    )
+
+
+def reduce_prompt(partials: list) -> str:
+    parts = "\n\n".join(f"Part {i}:\n{p}" for i, p in enumerate(partials, 1))
+    return (
+        "The following are summaries of consecutive parts of one conversation or "
+        "video transcript. Combine them into a single concise and insightful summary "
+        "of the whole. If it's a conversation, highlight key points. "
+        "If it's a transcript, extract the main takeaways. "
+        "Keep it under 200 words.\n\n"
+        f"{parts}"
+    )
+
+
+def split_text(text: str, max_chars: int) -> list:
+    """
+    Splits text into pieces of at most max_chars, breaking between lines
+    where possible, then after sentences, then between words.
+    """
+    pieces = []
+    current = ""
+    for line in text.splitlines(keepends=True):
+        while len(line) > max_chars:
+            cut = line.rfind(". ", 0, max_chars)
+            if cut == -1:
+                cut = line.rfind(" ", 0, max_chars)
+            cut = cut + 1 if cut > 0 else max_chars
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(line[:cut])
+            line = line[cut:]
+        if len(current) + len(line) > max_chars:
+            pieces.append(current)
+            current = ""
+        current += line
+    if current.strip():
+        pieces.append(current)
+    return [p for p in pieces if p.strip()]
+
+
+class MapReduceSummarizer:
+    """
+    Summarizes inputs of any length without truncating them.
+
+    Short inputs get a single summary_prompt(). Longer ones are split into
+    chunks that are summarized concurrently (map), and the chunk summaries
+    are combined by one final prompt (reduce), in rounds if there are too
+    many to fit. Chunk summaries go through the summary cache, so a repeat
+    or a change to the final prompt only redoes the reduce step.
+    """
+
+    def __init__(self, clients, cache, chunk_chars: int = MAP_CHUNK_CHARS,
+                 max_concurrency: int = MAP_CONCURRENCY):
+        self.clients = clients
+        self.cache = cache
+        self.chunk_chars = chunk_chars
+        self.max_concurrency = max_concurrency
+
+    async def complete(self, prompt: str) -> str:
+        """One cached completion, run in an LLM slot."""
+        key = summary_key(self.clients.model, prompt)
+        cached = await run_in_threadpool(self.cache.get, key)
+        if cached is not None:
+            return cached
+        async with self.clients.slot() as llm:
+            response = await llm.ainvoke(prompt)
+        await run_in_threadpool(self.cache.put, key, response.content)
+        return response.content
+
+    async def _map(self, chunks: list) -> list:
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def summarize_chunk(chunk):
+            async with semaphore:
+                return await self.complete(map_prompt(chunk))
+
+        return await asyncio.gather(*(summarize_chunk(c) for c in chunks))
+
+    async def final_prompt(self, text: str) -> str:
+        """
+        Runs the map step(s) and returns the prompt whose completion is the
+        summary of text. Callers run (or stream) that last call themselves.
+        """
+        if len(text) <= self.chunk_chars:
+            return summary_prompt(text)
+
+        partials = await self._map(split_text(text, self.chunk_chars))
+        # Too many partials for one prompt: summarize them in groups first
+        while len(reduce_prompt(partials)) > self.chunk_chars and len(partials) > 1:
+            groups = split_text("\n\n".join(partials), self.chunk_chars)
+            if len(groups) >= len(partials):
+                break
+            partials = await self._map(groups)
+        return reduce_prompt(partials)
+
+    async def summarize(self, text: str) -> str:
+        return await self.complete(await self.final_prompt(text))
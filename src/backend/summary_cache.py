@@ -0,0 +1,97 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+
+# Reads whose access time is held in memory before being written out
+ACCESS_FLUSH_EVERY = 64
+
+
+def summary_key(model: str, prompt: str) -> str:
+    """A summary is a pure function of the model and the full prompt."""
+    return hashlib.sha256(f"{model}\0{prompt}".encode("utf-8")).hexdigest()
+
+
+class SummaryCache:
+    """
+    Persistent map of summary_key() -> summary text in a local SQLite file.
+
+    Holds at most max_entries summaries; when a put goes over, the least
+    recently read ones are evicted. Survives restarts, so a transcript is
+    only ever summarized once per prompt and model.
+
+    A hit is a single SELECT: access times are only collected in memory and
+    written with the next put(), every ACCESS_FLUSH_EVERY reads, or on
+    close(). Losing some of them in a crash only makes eviction slightly
+    less exact. Calls block on disk I/O, so async code should run them in a
+    thread pool.
+    """
+
+    def __init__(self, path: str, max_entries: int = 5000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._accessed = {}  # key -> read time not yet written
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # With WAL this is still crash-safe, without an fsync on every commit
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS summaries ("
+            " key TEXT PRIMARY KEY,"
+            " summary TEXT NOT NULL,"
+            " accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS summaries_accessed ON summaries (accessed)")
+        self._conn.commit()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute("SELECT summary FROM summaries WHERE key = ?", [key]).fetchone()
+            if row is None:
+                return None
+            self._accessed[key] = time.time()
+            if len(self._accessed) >= ACCESS_FLUSH_EVERY:
+                self._flush_accessed()
+                self._conn.commit()
+        return row[0]
+
+    def _flush_accessed(self):
+        if self._accessed:
+            self._conn.executemany(
+                "UPDATE summaries SET accessed = ? WHERE key = ?",
+                [(accessed, key) for key, accessed in self._accessed.items()],
+            )
+            self._accessed.clear()
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM summaries WHERE key = ?", [key]).fetchone() is not None
+
+    def put(self, key: str, summary: str):
+        with self._lock:
+            # Eviction below needs current access times
+            self._flush_accessed()
+            self._accessed.pop(key, None)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO summaries (key, summary, accessed) VALUES (?, ?, ?)",
+                [key, summary, time.time()],
+            )
+            self._conn.execute(
+                "DELETE FROM summaries WHERE key IN ("
+                " SELECT key FROM summaries ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                [self.max_entries],
+            )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._flush_accessed()
+            self._conn.commit()
+            self._conn.close()
@@ -0,0 +1,249 @@
+import re
+import os
+import unicodedata
+from datetime import datetime, timedelta
+
+# All patterns are compiled once at import time and shared by every parse.
+
+# [Date, Time] Sender: Message, with the date and time split into their
+# numeric parts so timestamps can be built without strptime.
+# Handles 2-digit (25) and 4-digit (2025) years.
+HEADER_PATTERN = re.compile(
+    r'^\[(\d{1,2})/(\d{1,2})/(\d{2,4}),\s*'
+    r'((\d{1,2}):(\d{2}):(\d{2})\s*([APap])[Mm])\]\s*(.*?):\s*(.*)$'
+)
+# Date-only prefix used to sniff the date order of an export
+DATE_PREFIX_PATTERN = re.compile(r'^\[(\d{1,2})/(\d{1,2})/(\d{2,4}),')
+ATTACHMENT_PATTERN = re.compile(r'<attached:\s*(.*?)>')
+# Matches: youtube.com/watch?v=ID, youtu.be/ID, youtube.com/embed/ID
+YOUTUBE_URL_PATTERN = re.compile(r'https?://(?:www\.)?(?:youtube\.com/(?:watch\?v=|embed/)|youtu\.be/)([\w\-]+)')
+VIDEO_ID_PATTERN = re.compile(r'(?:v=|youtu\.be/|embed/)([\w\-]+)')
+# System notices, matched against the lower-cased message
+SYSTEM_NOTICE_PATTERN = re.compile(r'joined using (?:a|this) group|security code changed|added you')
+# "added +1..." or "added ~...", matched against the original message
+ADDED_MEMBER_PATTERN = re.compile(r'added\s+[\+~]')
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.gif'}
+VIDEO_FILE_EXTENSIONS = {'.mp4', '.mov'}
+
+DATE_ORDER_MDY = "mdy"
+DATE_ORDER_DMY = "dmy"
+
+
+def extract_video_url(text: str) -> str | None:
+    if not text:
+        return None
+
+    match = YOUTUBE_URL_PATTERN.search(text)
+    if match:
+        # Normalize to standard YouTube watch URL for better ReactPlayer compatibility
+        return f"https://www.youtube.com/watch?v={match.group(1)}"
+
+    # Fallback for explicit URL: pattern
+    if "URL:" in text:
+        try:
+            idx = text.find("URL:")
+            possible_url = text[idx+4:].strip().split()[0]
+            if "http" in possible_url:
+                # Try to extract video ID and normalize
+                vid_match = VIDEO_ID_PATTERN.search(possible_url)
+                if vid_match:
+                    return f"https://www.youtube.com/watch?v={vid_match.group(1)}"
+                return possible_url
+        except:
+            pass
+
+    return None
+
+
+def extract_video_id(url: str) -> str | None:
+    match = VIDEO_ID_PATTERN.search(url) if url else None
+    return match.group(1) if match else None
+
+
+def detect_date_order(lines) -> str:
+    """
+    Decides once per export whether dates are M/D or D/M by looking for a
+    header whose first or second field can only be a day (> 12). Ambiguous
+    exports fall back to M/D, which is what WhatsApp writes for US locales.
+    """
+    for line in lines:
+        match = DATE_PREFIX_PATTERN.match(line.lstrip('\u200e\u200f \t'))
+        if not match:
+            continue
+        first, second = int(match.group(1)), int(match.group(2))
+        if first > 12 >= second:
+            return DATE_ORDER_DMY
+        if second > 12 >= first:
+            return DATE_ORDER_MDY
+    return DATE_ORDER_MDY
+
+
+def detect_file_date_order(path: str, max_lines: int = 5000) -> str:
+    """Sniffs the date order from the first max_lines lines of an export."""
+    def head():
+        with open(path, 'r', encoding='utf-8') as f:
+            for i, line in enumerate(f):
+                if i >= max_lines:
+                    break
+                yield line
+    return detect_date_order(head())
+
+
+class MessageTokenizer:
+    """
+    Turns cleaned chat lines into message records. The date order is fixed
+    per file, so each timestamp is built from the header's integer fields
+    instead of trying several strptime formats per line.
+    """
+
+    def __init__(self, date_order: str = DATE_ORDER_MDY):
+        self.date_order = date_order
+
+    def build_datetime(self, first: str, second: str, year: str,
+                       hour: str, minute: str, second_of_minute: str, meridiem: str) -> datetime:
+        if len(year) == 2:
+            # Same pivot as strptime's %y
+            y = int(year)
+            y += 2000 if y < 69 else 1900
+        elif len(year) == 4:
+            y = int(year)
+        else:
+            return datetime.now() # Fallback
+
+        h = int(hour)
+        if not 1 <= h <= 12:
+            return datetime.now() # Fallback
+        h = h % 12 + (12 if meridiem in 'Pp' else 0)
+        a, b = int(first), int(second)
+        m, d = (b, a) if self.date_order == DATE_ORDER_DMY else (a, b)
+
+        try:
+            return datetime(y, m, d, h, int(minute), int(second_of_minute))
+        except ValueError:
+            pass
+        # An impossible date in the detected order; try the other one
+        try:
+            return datetime(y, d, m, h, int(minute), int(second_of_minute))
+        except ValueError:
+            return datetime.now() # Fallback
+
+    def tokenize_header(self, line: str):
+        """
+        Returns a new message record if line starts a message, False if it is
+        a filtered system notice, and None if it is a continuation line.
+        """
+        match = HEADER_PATTERN.match(line)
+        if not match:
+            return None
+
+        (first, second, year, time_str, hour, minute, sec, meridiem,
+         sender, msg_content) = match.groups()
+        dt_obj = self.build_datetime(first, second, year, hour, minute, sec, meridiem)
+
+        msg_type = "text"
+        url = None
+        file_path = None
+
+        attachment_match = ATTACHMENT_PATTERN.search(msg_content) if '<attached:' in msg_content else None
+        if attachment_match:
+            filename = attachment_match.group(1).strip()
+            ext = os.path.splitext(filename)[1].lower()
+            if ext in IMAGE_EXTENSIONS:
+                msg_type = "image"
+                file_path = f"/static/{filename}"
+            elif ext in VIDEO_FILE_EXTENSIONS:
+                msg_type = "video_file"
+                file_path = f"/static/{filename}"
+
+            # Remove attachment tag from content
+            msg_content = msg_content.replace(attachment_match.group(0), "").strip()
+
+        else:
+            # Clean invisible control characters; printable text has none
+            if not msg_content.isprintable():
+                msg_content = "".join(ch for ch in msg_content if unicodedata.category(ch)[0] != "C")
+
+            # Skip system messages - Aggressive Filter
+            lower_content = msg_content.lower()
+            if SYSTEM_NOTICE_PATTERN.search(lower_content):
+                return False
+            if "added" in lower_content and ADDED_MEMBER_PATTERN.search(msg_content):
+                return False
+            if lower_content.strip() == "left":
+                return False
+
+            if "http" in msg_content or "URL:" in msg_content:
+                url = extract_video_url(msg_content)
+
+        return {
+            "type": msg_type,
+            "time_obj": dt_obj,
+            "time": time_str,
+            "sender": sender.strip(),
+            "content": msg_content if msg_content else (file_path if file_path else ""),
+            "is_video": True if url else False,
+            "video_url": url,
+            "image_url": file_path
+        }
+
+    def tokenize(self, lines):
+        """
+        Consumes (offset, line) pairs and yields (offset, message) pairs, where
+        offset is that of the header line the message came from. Only the
+        message still receiving continuation lines is held in memory.
+        """
+        pending = None
+        pending_offset = None
+
+        for offset, line in lines:
+            line = line.strip()
+            # Remove LTR/RTL marks
+            if '\u200e' in line or '\u200f' in line:
+                line = line.replace('\u200e', '').replace('\u200f', '')
+
+            if not line:
+                continue
+
+            message = self.tokenize_header(line) if line[0] == '[' else None
+            if message is False:
+                continue
+            if message is not None:
+                if pending is not None:
+                    yield pending_offset, pending
+                pending = message
+                pending_offset = offset
+                continue
+            if pending is None:
+                continue
+
+            # Continuation of previous message; only lines that can hold a
+            # link can change the message's video
+            has_link = "http" in line or "URL:" in line
+            new_line_url = extract_video_url(line) if has_link else None
+
+            # If previous message ALREADY has a video, and this line has a DIFFERENT video
+            if pending["is_video"] and new_line_url and new_line_url != pending["video_url"]:
+                # Create a new message for this video to allow multiple videos in one "block"
+                split_msg = pending.copy()
+                split_msg["content"] = line
+                split_msg["video_url"] = new_line_url
+                split_msg["is_video"] = True
+                split_msg["image_url"] = None
+                # Offset time slightly to preserve order
+                split_msg["time_obj"] = pending["time_obj"] + timedelta(milliseconds=100)
+
+                yield pending_offset, pending
+                pending = split_msg
+            else:
+                # Standard continuation
+                pending["content"] += "\n" + line
+                # Re-check for URL if not found yet
+                if not pending["is_video"] and has_link:
+                    url = extract_video_url(pending["content"])
+                    if url:
+                        pending["is_video"] = True
+                        pending["video_url"] = url
+
+        if pending is not None:
+            yield pending_offset, pending
@@ -0,0 +1,187 @@
+import os
+import json
+import threading
+from .tokenizer import VIDEO_ID_PATTERN
+
+INDEX_VERSION = 1
+
+
+class TranscriptStore:
+    """
+    Read-only view over youtube_transcripts.txt backed by a persistent index.
+
+    The index maps each video ID to the byte spans of its transcript blocks
+    and is saved next to the transcript file, keyed by the file's size and
+    mtime. Bodies are read by offset only when asked for, so a parse that
+    references a handful of videos never reads the rest.
+
+    The file may be rewritten while the server runs (in place or by
+    rename). Every lookup checks its size and mtime first and re-indexes
+    when they changed, and a span that reads short is treated the same way,
+    so a stale index never returns another video's text.
+    """
+
+    def __init__(self, transcript_file: str, index_file: str = None):
+        self.transcript_file = transcript_file
+        self.index_file = index_file or os.path.splitext(transcript_file)[0] + ".idx.json"
+        self._index = None  # { video_id: [[start, end], ...] } in file order
+        self._signature = None
+        self._file = None
+        # Guards the index and the open file; re-entrant since reads refresh
+        self._lock = threading.RLock()
+
+    def exists(self) -> bool:
+        return os.path.exists(self.transcript_file)
+
+    def _file_signature(self) -> list:
+        st = os.stat(self.transcript_file)
+        return [st.st_size, st.st_mtime_ns]
+
+    @property
+    def signature(self) -> list:
+        """Size and mtime of the transcript file the index was built from."""
+        self._ensure_index()
+        return self._signature
+
+    def _ensure_index(self):
+        with self._lock:
+            signature = self._file_signature()
+            if self._index is not None and signature == self._signature:
+                return
+            if self._index is not None:
+                print(f"{self.transcript_file} changed on disk, re-indexing...")
+            self._close_file()
+            self._load_index(signature)
+
+    def _load_index(self, signature: list):
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            if saved.get("version") == INDEX_VERSION and saved.get("signature") == signature:
+                self._index = saved["videos"]
+                self._signature = signature
+                return
+        except (OSError, ValueError, KeyError):
+            pass
+
+        self._index = self.build_index()
+        self._signature = signature
+        self._save_index()
+
+    def build_index(self) -> dict:
+        """
+        Scans the transcript file once, recording the byte span of each block.
+        A block starts after a "URL:" line and runs until the next one; the
+        header and separator lines inside the span are dropped on read.
+        """
+        index = {}
+        current_vid_id = None
+        start = 0
+        offset = 0
+
+        def close_block(end):
+            if current_vid_id and end > start:
+                index.setdefault(current_vid_id, []).append([start, end])
+
+        with open(self.transcript_file, 'rb') as f:
+            for line in f:
+                line_end = offset + len(line)
+                # Check for URL line which signals start of new video context
+                if b"URL:" in line:
+                    close_block(offset)
+                    vid_match = VIDEO_ID_PATTERN.search(line.decode('utf-8', errors='replace'))
+                    current_vid_id = vid_match.group(1).strip() if vid_match else None
+                    start = line_end
+                offset = line_end
+        close_block(offset)
+
+        print(f"Indexed transcripts for {len(index)} videos.")
+        return index
+
+    def _save_index(self):
+        payload = {"version": INDEX_VERSION, "signature": self._signature, "videos": self._index}
+        tmp_file = self.index_file + ".tmp"
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(payload, f)
+            os.replace(tmp_file, self.index_file)
+        except OSError as e:
+            # Read-only deployments still work, they just rebuild the index
+            print(f"Could not save transcript index: {e}")
+
+    def video_ids(self) -> list:
+        """Indexed video IDs, in the order they appear in the file."""
+        self._ensure_index()
+        return list(self._index)
+
+    def __contains__(self, video_id: str) -> bool:
+        self._ensure_index()
+        return video_id in self._index
+
+    def _read_span(self, start: int, end: int) -> str | None:
+        """Text of one block, or None if the file no longer holds the span."""
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.transcript_file, 'rb')
+            self._file.seek(start)
+            data = self._file.read(end - start)
+        if len(data) < end - start:
+            return None
+        raw = data.decode('utf-8', errors='replace')
+        raw = raw.replace('\r\n', '\n').replace('\r', '\n')
+
+        kept = [
+            line for line in raw.splitlines(keepends=True)
+            # Block headers and separators, not transcript text
+            if "[Video Transcript]" not in line and "=======" not in line
+        ]
+        return "".join(kept).strip()
+
+    def get_all(self, video_id: str) -> list:
+        """Returns every non-empty transcript body stored for video_id."""
+        with self._lock:
+            # Once more after a short read: the file changed since the stat
+            for _ in range(2):
+                self._ensure_index()
+                bodies = []
+                for start, end in self._index.get(video_id, []):
+                    body = self._read_span(start, end)
+                    if body is None:
+                        self._index = None
+                        break
+                    if body:
+                        bodies.append(body)
+                else:
+                    return bodies
+        return []
+
+    def get(self, video_id: str) -> str | None:
+        """Returns the first non-empty transcript body for video_id."""
+        bodies = self.get_all(video_id)
+        return bodies[0] if bodies else None
+
+    def get_by_id(self, transcript_id: str) -> str | None:
+        """Resolves an ID from transcript_id() back to its body."""
+        video_id, _, block = transcript_id.partition(".")
+        if block and not block.isdigit():
+            return None
+        bodies = self.get_all(video_id)
+        n = int(block or 0)
+        return bodies[n] if n < len(bodies) else None
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def close(self):
+        with self._lock:
+            self._close_file()
+
+
+def transcript_id(video_id: str, block: int = 0) -> str:
+    """
+    Stable ID of the block-th non-empty transcript of a video. Most videos
+    have one block, whose ID is just the video ID.
+    """
+    return video_id if block == 0 else f"{video_id}.{block}"
@@ -1,8 +1,23 @@
 import os
 import re
-import glob
-import webvtt
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from yt_dlp import YoutubeDL
+try:
+    from .captions import captions_to_text
+except ImportError:
+    # Run as a script: python src/batch_transcript_fetcher.py
+    from captions import captions_to_text
+
+# Videos fetched at the same time
+MAX_WORKERS = 8
+# Per-video transcripts and the manifest of what has been fetched
+CACHE_DIR = "transcript_cache"
+MANIFEST_FILE = "manifest.json"
+
+VIDEO_ID_PATTERN = re.compile(r'(?:v=|youtu\.be/|shorts/|embed/)([\w-]+)')
+# Placeholders returned by download_and_extract_transcript
+UNAVAILABLE_MARKERS = ("[Transcript Unavailable]", "[No transcript available]")
 
 def parse_markdown_links(md_file_path):
     """
@@ -34,17 +49,31 @@ def parse_markdown_links(md_file_path):
     
     return links
 
-def download_and_extract_transcript(url, output_dir):
+def pick_subtitle_url(info, lang="en"):
     """
-    Downloads subtitles for a video and returns the text content.
+    (url, kind) of the best English WebVTT track in a yt-dlp info dict:
+    manual subtitles first, then automatic captions. kind is the info dict
+    field the track came from, "subtitles" or "automatic_captions"; both are
+    None if there is no track.
+    """
+    for field in ("subtitles", "automatic_captions"):
+        tracks = info.get(field) or {}
+        # "en" first, then regional/original variants such as "en-US", "en-orig"
+        langs = sorted((l for l in tracks if l == lang or l.startswith(lang + "-")), key=lambda l: l != lang)
+        for l in langs:
+            for fmt in tracks[l]:
+                if fmt.get("ext") == "vtt" and fmt.get("url"):
+                    return fmt["url"], field
+    return None, None
+
+def download_and_extract_transcript(url, keep_timestamps=False):
+    """
+    Downloads subtitles for a video and returns the text content. The
+    captions are fetched and parsed in memory; when only automatic captions
+    exist, their rolling duplicates are removed (see captions.py).
     """
     ydl_opts = {
         'skip_download': True,
-        'format': 'best', # Explicitly ask for best format even if skipping download 
-        'writeautomaticsub': True,
-        'writesubtitles': True,
-        'subtitleslangs': ['en'],
-        'outtmpl': os.path.join(output_dir, '%(id)s'),
         'quiet': True,
         'no_warnings': True,
         'ignoreerrors': True,
@@ -52,83 +81,180 @@ def download_and_extract_transcript(url, output_dir):
 
     try:
         with YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=True)
+            info = ydl.extract_info(url, download=False)
             if not info:
                 print(f"Skipping {url}: Could not extract info (likely restricted).")
                 return "[Transcript Unavailable]"
-                
-            video_id = info['id']
-            
-            # Find the downloaded .vtt file
-            # yt-dlp usually names it video_id.en.vtt or video_id.en.srv3 etc
-            potential_files = glob.glob(os.path.join(output_dir, f"{video_id}*.vtt"))
-            
-            if not potential_files:
+
+            subtitle_url, kind = pick_subtitle_url(info)
+            if not subtitle_url:
                 return "[No transcript available]"
-            
-            vtt_file = potential_files[0]
-            
-            # Extract text from VTT
-            transcript_text = ""
-            try:
-                for caption in webvtt.read(vtt_file):
-                    # Simple deduplication (often VTT has scrolling duplicates)
-                    text = caption.text.strip()
-                    # Remove timestamps and newlines
-                    text = text.replace('\n', ' ')
-                    transcript_text += text + " "
-            except Exception as e:
-                print(f"Error parsing VTT for {url}: {e}")
-                return "[Error parsing transcript]"
-            
-            # Cleanup: remove the vtt file
-            os.remove(vtt_file)
-            
-            return transcript_text.strip()
+
+            payload = ydl.urlopen(subtitle_url).read().decode('utf-8', errors='replace')
+
+        try:
+            return captions_to_text(payload, keep_timestamps=keep_timestamps,
+                                    rolling=kind == "automatic_captions")
+        except Exception as e:
+            print(f"Error parsing VTT for {url}: {e}")
+            return "[Error parsing transcript]"
             
     except Exception as e:
         print(f"Error downloading for {url}: {e}")
         return f"[Error fetching: {e}]"
 
+def video_key(url):
+    """Video ID of a YouTube URL, or the URL itself for anything else."""
+    match = VIDEO_ID_PATTERN.search(url)
+    return match.group(1) if match else url
+
+
+def format_entry(title, url, transcript):
+    # Clean up text slightly (remove multiple spaces)
+    transcript = re.sub(r'\s+', ' ', transcript)
+
+    entry = f"\n\n================================================================\n"
+    entry += f"[Video Transcript] {title}\n"
+    entry += f"URL: {url}\n"
+    entry += f"================================================================\n"
+    entry += f"{transcript}\n"
+    return entry
+
+
+def classify(transcript):
+    """Manifest status for a fetch result."""
+    if transcript in UNAVAILABLE_MARKERS:
+        return "unavailable"
+    if transcript.startswith("[Error"):
+        return "failed"
+    return "fetched"
+
+
+class TranscriptCache:
+    """
+    One file per fetched video plus a manifest recording, per video, whether
+    it was fetched, failed or has no transcript. Failed videos are retried
+    on the next run; everything else is served from disk.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self.manifest_path = os.path.join(cache_dir, MANIFEST_FILE)
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                self.manifest = json.load(f)
+        except (OSError, ValueError):
+            self.manifest = {}
+
+    def _path(self, key):
+        safe = re.sub(r'[^\w-]', '_', key)
+        return os.path.join(self.cache_dir, f"{safe}.txt")
+
+    def get(self, key):
+        """Cached result for key, or None if it still has to be fetched."""
+        entry = self.manifest.get(key)
+        if not entry or entry["status"] == "failed":
+            return None
+        if entry["status"] == "unavailable":
+            return entry["result"]
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put(self, key, video, transcript):
+        status = classify(transcript)
+        entry = {"status": status, "title": video['title'], "url": video['url']}
+        if status == "fetched":
+            with open(self._path(key), 'w', encoding='utf-8') as f:
+                f.write(transcript)
+        else:
+            entry["result"] = transcript
+        self.manifest[key] = entry
+        self.save()
+        return status
+
+    def save(self):
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+
+def fetch_all(videos, output_file, fetch=download_and_extract_transcript,
+              cache_dir=CACHE_DIR, max_workers=MAX_WORKERS):
+    """
+    Fetches transcripts for videos on a pool of max_workers threads and
+    writes them to output_file in the order of videos. Entries are written
+    as soon as every earlier video is done, to a .partial file that
+    replaces output_file at the end. fetch(url) returns the
+    transcript text; pass a fake to run without YouTube.
+    Returns {status: count}.
+    """
+    cache = TranscriptCache(cache_dir)
+    results = {}  # index -> transcript, for videos not yet written
+    counts = {"cached": 0, "fetched": 0, "failed": 0, "unavailable": 0}
+
+    # A video listed twice is only fetched once
+    pending = {}
+    for i, video in enumerate(videos):
+        key = video_key(video['url'])
+        cached = cache.get(key)
+        if cached is not None:
+            results[i] = cached
+            counts["cached"] += 1
+        else:
+            pending.setdefault(key, []).append(i)
+    print(f"{counts['cached']} transcripts cached, fetching {len(pending)} with {max_workers} workers...")
+
+    partial_file = output_file + ".partial"
+    next_index = 0
+    with open(partial_file, "w", encoding="utf-8") as out:
+        def write_ready():
+            nonlocal next_index
+            while next_index in results:
+                video = videos[next_index]
+                out.write(format_entry(video['title'], video['url'], results.pop(next_index)))
+                next_index += 1
+            out.flush()
+
+        write_ready()
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {
+                pool.submit(fetch, videos[indices[0]]['url']): key
+                for key, indices in pending.items()
+            }
+            for done, future in enumerate(as_completed(futures), 1):
+                key = futures[future]
+                indices = pending[key]
+                try:
+                    transcript = future.result()
+                except Exception as e:
+                    transcript = f"[Error fetching: {e}]"
+                status = cache.put(key, videos[indices[0]], transcript)
+                counts[status] += 1
+                print(f"[{done}/{len(futures)}] {status}: {videos[indices[0]]['title']}")
+
+                for i in indices:
+                    results[i] = transcript
+                write_ready()
+
+    os.replace(partial_file, output_file)
+    return counts
+
+
 def main():
     links_file = "youtube_links.md"
     output_file = "youtube_transcripts.txt"
-    temp_dir = "temp_transcripts"
-    
-    if not os.path.exists(temp_dir):
-        os.makedirs(temp_dir)
         
     print(f"Parsing links from {links_file}...")
     videos = parse_markdown_links(links_file)
     print(f"Found {len(videos)} videos.")
-    
-    all_content = ""
-    
-    for i, video in enumerate(videos):
-        print(f"[{i+1}/{len(videos)}] Fetching transcript for: {video['title']}")
-        transcript = download_and_extract_transcript(video['url'], temp_dir)
-        
-        # Clean up text slightly (remove multiple spaces)
-        transcript = re.sub(r'\s+', ' ', transcript)
-        
-        entry = f"\n\n================================================================\n"
-        entry += f"[Video Transcript] {video['title']}\n"
-        entry += f"URL: {video['url']}\n"
-        entry += f"================================================================\n"
-        entry += f"{transcript}\n"
-        
-        all_content += entry
-        
-    with open(output_file, "w", encoding="utf-8") as f:
-        f.write(all_content)
-        
-    print(f"Done. Saved all transcripts to {output_file}")
-    
-    # Cleanup temp dir
-    try:
-        os.rmdir(temp_dir)
-    except:
-        pass
+
+    counts = fetch_all(videos, output_file)
+    print(f"Done. Saved all transcripts to {output_file} ({counts})")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,98 @@
+import re
+
+TIMING_PATTERN = re.compile(
+    r'^(?:(\d+):)?(\d{1,2}):(\d{2})[.,](\d{3})\s+-->\s+(?:(\d+):)?(\d{1,2}):(\d{2})[.,](\d{3})'
+)
+# Inline word timings (<00:00:01.234>) and styling tags (<c>, </c>, <i>...)
+TAG_PATTERN = re.compile(r'<[^>]*>')
+ENTITIES = {"&amp;": "&", "&lt;": "<", "&gt;": ">", "&nbsp;": " ", "&#39;": "'", "&quot;": '"'}
+ENTITY_PATTERN = re.compile("|".join(map(re.escape, ENTITIES)))
+# Seconds between timestamps when they are kept
+TIMESTAMP_INTERVAL = 30
+
+
+def _seconds(hours, minutes, seconds, millis):
+    return int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds) + int(millis) / 1000
+
+
+def parse_vtt(payload):
+    """
+    Parses a WebVTT payload (str) into [(start_seconds, [lines])] cues.
+    Headers, NOTE/STYLE blocks, cue identifiers and inline tags are dropped.
+    """
+    cues = []
+    start = None
+    lines = []
+    for raw in payload.splitlines():
+        line = raw.strip()
+        # Only a truly empty line ends a cue; YouTube pads cues with " " lines
+        if not raw:
+            if start is not None and lines:
+                cues.append((start, lines))
+            start, lines = None, []
+            continue
+        if not line:
+            continue
+        timing = TIMING_PATTERN.match(line)
+        if timing:
+            start = _seconds(*timing.groups()[:4])
+            lines = []
+        elif start is not None:
+            text = ENTITY_PATTERN.sub(lambda m: ENTITIES[m.group(0)], TAG_PATTERN.sub("", line)).strip()
+            if text:
+                lines.append(text)
+    if start is not None and lines:
+        cues.append((start, lines))
+    return cues
+
+
+def dedupe_rolling(cues):
+    """
+    Collapses YouTube's rolling auto-captions, where every cue repeats the
+    previous line before adding a new one, into [(start_seconds, line)]
+    with each line once. A line that extends the previous one by whole
+    words replaces it. Each line is compared only with the last one kept, so
+    this is linear in the size of the captions. Only meant for automatic
+    captions: manual subtitles may legitimately repeat a line.
+    """
+    kept = []
+    for start, lines in cues:
+        for line in lines:
+            if kept:
+                last = kept[-1][1]
+                if line == last:
+                    continue
+                if line.startswith(last + " "):
+                    kept[-1] = (kept[-1][0], line)
+                    continue
+            kept.append((start, line))
+    return kept
+
+
+def format_timestamp(seconds):
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+def captions_to_text(payload, keep_timestamps=False, interval=TIMESTAMP_INTERVAL, rolling=False):
+    """
+    Plain transcript text from a WebVTT payload. With keep_timestamps, a
+    [m:ss] marker is inserted at most every interval seconds so readers can
+    deep-link into the video (youtube.com/watch?v=...&t=<seconds>). Pass
+    rolling for YouTube automatic captions to drop their repeated lines.
+    """
+    cues = parse_vtt(payload)
+    if rolling:
+        lines = dedupe_rolling(cues)
+    else:
+        lines = [(start, line) for start, cue_lines in cues for line in cue_lines]
+    parts = []
+    next_mark = 0
+    for start, line in lines:
+        if keep_timestamps and start >= next_mark:
+            parts.append(f"[{format_timestamp(start)}]")
+            next_mark = start + interval
+        parts.append(line)
+    return " ".join(parts)
@@ -0,0 +1,169 @@
+import re
+from datetime import datetime
+from .backend.tokenizer import extract_video_id
+
+# Per-chunk budget, in estimated tokens (~1000 characters)
+CHUNK_TOKENS = 256
+# Rough chars-per-token for English text; avoids a tokenizer dependency
+CHARS_PER_TOKEN = 4
+# Message types whose content is a file name rather than text
+SKIPPED_TYPES = ("image", "video_file")
+
+SENTENCE_PATTERN = re.compile(r'(?<=[.!?])\s+')
+
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _iso_date(date_str):
+    """Timeline keys are MM/DD/YYYY; metadata uses ISO dates so they sort."""
+    try:
+        return datetime.strptime(date_str, "%m/%d/%Y").strftime("%Y-%m-%d")
+    except ValueError:
+        return date_str
+
+
+def split_sentences(text, max_tokens):
+    """
+    Splits text into sentences, breaking any sentence longer than max_tokens
+    on word boundaries (auto-generated captions often have no punctuation).
+    """
+    pieces = []
+    for sentence in SENTENCE_PATTERN.split(text.strip()):
+        sentence = " ".join(sentence.split())
+        if not sentence:
+            continue
+        if estimate_tokens(sentence) <= max_tokens:
+            pieces.append(sentence)
+            continue
+        current = []
+        size = 0
+        for word in sentence.split(" "):
+            if current and size + len(word) + 1 > max_tokens * CHARS_PER_TOKEN:
+                pieces.append(" ".join(current))
+                current, size = [], 0
+            current.append(word)
+            size += len(word) + 1
+        if current:
+            pieces.append(" ".join(current))
+    return pieces
+
+
+def window_text(text, max_tokens, header=""):
+    """Packs whole sentences of text into windows of at most max_tokens."""
+    budget = max(1, max_tokens - estimate_tokens(header))
+    windows = []
+    current = []
+    size = 0
+    for sentence in split_sentences(text, budget):
+        tokens = estimate_tokens(sentence) + 1
+        if current and size + tokens > budget:
+            windows.append(header + " ".join(current))
+            current, size = [], 0
+        current.append(sentence)
+        size += tokens
+    if current:
+        windows.append(header + " ".join(current))
+    return windows
+
+
+def _chat_chunks(date, messages, batch, max_tokens):
+    chunks = []
+    lines = []
+    size = 0
+    group = []
+
+    def flush():
+        if not lines:
+            return
+        senders = list(dict.fromkeys(m["sender"] for m in group))
+        video_ids = [v for v in dict.fromkeys(extract_video_id(m["video_url"]) for m in group) if v]
+        chunks.append({
+            "text": "\n".join(lines),
+            "metadata": {
+                "type": "chat",
+                "batch": batch,
+                "date": _iso_date(date),
+                "start_time": group[0]["time"],
+                "end_time": group[-1]["time"],
+                "senders": senders,
+                "video_ids": video_ids,
+            },
+        })
+        lines.clear()
+        group.clear()
+
+    for msg in messages:
+        content = msg["content"] if isinstance(msg["content"], str) else ""
+        if msg["type"] in SKIPPED_TYPES or not content.strip():
+            continue
+        prefix = f"[{date}, {msg['time']}] {msg['sender']}: "
+        line = prefix + content.strip()
+        tokens = estimate_tokens(line) + 1
+
+        if tokens > max_tokens:
+            # One oversized message gets windows of its own
+            flush()
+            size = 0
+            for window in window_text(content, max_tokens, header=prefix):
+                lines.append(window)
+                group.append(msg)
+                flush()
+            continue
+
+        if lines and size + tokens > max_tokens:
+            flush()
+            size = 0
+        lines.append(line)
+        group.append(msg)
+        size += tokens
+    flush()
+    return chunks
+
+
+def chunk_timeline(timeline, batch=None, transcript_store=None, max_tokens=CHUNK_TOKENS):
+    """
+    Turns a parsed timeline (ChatParser.parse() output) into a list of
+    {"text", "metadata"} chunks for embedding.
+
+    Chat messages are packed whole, in order, into chunks of up to
+    max_tokens that never span two days. Each transcript is chunked once,
+    however often its video was shared, in sentence-aligned windows dated
+    to the first share. Stubbed transcripts are read in full from
+    transcript_store. Chunks do not overlap.
+    """
+    chunks = []
+    seen_transcripts = set()
+
+    for day in timeline:
+        date = day["date"]
+        chat = [m for m in day["messages"] if m["type"] != "transcript"]
+        chunks.extend(_chat_chunks(date, chat, batch, max_tokens))
+
+        for msg in day["messages"]:
+            if msg["type"] != "transcript":
+                continue
+            video_id = extract_video_id(msg["video_url"])
+            key = msg.get("transcript_id") or (video_id, msg["content"])
+            if key in seen_transcripts:
+                continue
+            seen_transcripts.add(key)
+
+            body = msg["content"]
+            if msg.get("transcript_id") and transcript_store is not None:
+                body = transcript_store.get_by_id(msg["transcript_id"]) or body
+            header = f"[Video Transcript] {msg['video_url']} (shared {date})\n"
+            for part, window in enumerate(window_text(body, max_tokens, header=header)):
+                chunks.append({
+                    "text": window,
+                    "metadata": {
+                        "type": "transcript",
+                        "batch": batch,
+                        "date": _iso_date(date),
+                        "video_id": video_id,
+                        "video_url": msg["video_url"],
+                        "part": part,
+                    },
+                })
+    return chunks
@@ -0,0 +1,143 @@
+import time
+import random
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+EMBED_BATCH_SIZE = 100
+EMBED_CONCURRENCY = 4
+EMBED_MAX_RETRIES = 6
+EMBED_BASE_DELAY = 1.0
+EMBED_MAX_DELAY = 60.0
+
+
+def _status_code(exc):
+    for source in (exc, getattr(exc, "response", None)):
+        for attr in ("status_code", "code", "status"):
+            value = getattr(source, attr, None)
+            if isinstance(value, int):
+                return value
+    return None
+
+
+def is_rate_limited(exc):
+    """True for 429 / quota errors from any of the embedding clients."""
+    if _status_code(exc) == 429:
+        return True
+    text = str(exc).lower()
+    return any(marker in text for marker in ("429", "rate limit", "resource_exhausted", "resource exhausted", "quota"))
+
+
+def is_transient(exc):
+    """Server-side or network errors that are worth retrying."""
+    code = _status_code(exc)
+    if code is not None and 500 <= code < 600:
+        return True
+    return isinstance(exc, (ConnectionError, TimeoutError, asyncio.TimeoutError))
+
+
+def _retry_after(exc):
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class EmbeddingPipeline:
+    """
+    Embeds a list of texts in fixed-size batches with bounded concurrency.
+
+    A 429 from any batch pauses every worker until the backoff expires
+    (exponential with jitter, or the server's Retry-After), so the client
+    backs off as a whole instead of each request hammering the quota.
+    Completed batches are handed to on_batch as they finish, letting the
+    caller persist progress before the whole run is done. Works with any
+    LangChain Embeddings object, including one pointed at a local stub
+    server.
+    """
+
+    def __init__(self, embeddings, batch_size=EMBED_BATCH_SIZE, max_concurrency=EMBED_CONCURRENCY,
+                 max_retries=EMBED_MAX_RETRIES, base_delay=EMBED_BASE_DELAY, max_delay=EMBED_MAX_DELAY):
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.stats = {}
+        self._resume_at = 0.0
+
+    async def _wait_for_backoff(self):
+        delay = self._resume_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _embed_batch(self, texts):
+        attempt = 0
+        while True:
+            await self._wait_for_backoff()
+            try:
+                return await self.embeddings.aembed_documents(texts)
+            except Exception as e:
+                rate_limited = is_rate_limited(e)
+                if not (rate_limited or is_transient(e)) or attempt >= self.max_retries:
+                    raise
+                delay = _retry_after(e) or min(self.max_delay, self.base_delay * 2 ** attempt)
+                delay *= 1 + random.random() * 0.25
+                attempt += 1
+                self.stats["retries"] += 1
+                if rate_limited:
+                    # Backpressure: hold every worker, not just this one
+                    self.stats["rate_limited"] += 1
+                    self._resume_at = max(self._resume_at, time.monotonic() + delay)
+                    print(f"Rate limited, backing off {delay:.1f}s (attempt {attempt}/{self.max_retries})...")
+                else:
+                    print(f"Embedding request failed ({e}), retrying in {delay:.1f}s...")
+                    await asyncio.sleep(delay)
+
+    async def aembed(self, texts, on_batch=None):
+        """
+        Returns one vector per text, in order. on_batch(offset, vectors) is
+        called as each batch completes.
+        """
+        texts = list(texts)
+        results = [None] * len(texts)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        started = time.monotonic()
+        self.stats = {"chunks": 0, "total": len(texts), "batches": 0, "retries": 0,
+                      "rate_limited": 0, "seconds": 0.0, "chunks_per_sec": 0.0}
+
+        async def run(offset):
+            batch = texts[offset:offset + self.batch_size]
+            async with semaphore:
+                vectors = await self._embed_batch(batch)
+            results[offset:offset + len(batch)] = vectors
+            if on_batch:
+                on_batch(offset, vectors)
+
+            elapsed = time.monotonic() - started
+            self.stats["chunks"] += len(batch)
+            self.stats["batches"] += 1
+            self.stats["seconds"] = elapsed
+            self.stats["chunks_per_sec"] = self.stats["chunks"] / elapsed if elapsed else 0.0
+            print(f"Embedded {self.stats['chunks']}/{len(texts)} chunks "
+                  f"({self.stats['chunks_per_sec']:.1f} chunks/sec)")
+
+        tasks = [asyncio.create_task(run(offset)) for offset in range(0, len(texts), self.batch_size)]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+        return results
+
+    def embed(self, texts, on_batch=None):
+        """Synchronous wrapper around aembed()."""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.aembed(texts, on_batch))
+        # Already inside an event loop: run on a private loop in a worker thread
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            return pool.submit(asyncio.run, self.aembed(texts, on_batch)).result()
@@ -1,10 +1,11 @@
-import { useState, useEffect } from 'react'
+import { useState, useEffect, useRef } from 'react'
 import axios from 'axios'
 import ReactPlayer from 'react-player'
 import { Search, Sparkles, MessageSquare, Calendar, BookOpen, ChevronDown, ChevronUp, Image as ImageIcon, Layers, Settings } from 'lucide-react'
 
 // Production detection and URL helper
 const IS_PROD = import.meta.env.PROD;
+const API_BASE = 'http://localhost:8000/api';
 
 const resolveAssetUrl = (path) => {
   if (!path) return '';
@@ -20,6 +21,25 @@ const resolveAssetUrl = (path) => {
   return `http://localhost:8000${path}`;
 };
 
+// Calls onData with the payload of every "data:" line of a server-sent event stream
+const readEventStream = async (response, onData) => {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const events = buffer.split('\n\n');
+    buffer = events.pop();
+    for (const event of events) {
+      for (const line of event.split('\n')) {
+        if (line.startsWith('data:')) onData(line.slice(5).trim());
+      }
+    }
+  }
+};
+
 function App() {
   const [timeline, setTimeline] = useState([])
   const [filteredTimeline, setFilteredTimeline] = useState([])
@@ -29,6 +49,10 @@ function App() {
   const [summary, setSummary] = useState('')
   const [loadingSummary, setLoadingSummary] = useState(false)
   const [expandedTranscripts, setExpandedTranscripts] = useState({})
+  // Full transcript bodies fetched on demand, keyed by transcript_id
+  const [transcriptBodies, setTranscriptBodies] = useState({})
+  // Prod only: transcript ID -> URL of its static shard, from the batch manifest
+  const [transcriptFiles, setTranscriptFiles] = useState({})
   const [showSettings, setShowSettings] = useState(false)
   // Use build-time env var first (from GitHub Secrets), then localStorage as fallback
   const [groqKey, setGroqKey] = useState(() => {
@@ -87,17 +111,62 @@ function App() {
     setFilteredTimeline(result)
   }, [search, timeline, selectedDate])
 
+  // Days shown before the rest of a sharded timeline has loaded
+  const FIRST_PAINT_DAYS = 7
+  // Bumped on every timeline load; a load that is no longer the latest drops its results
+  const timelineRequest = useRef(0)
+
+  // Static builds publish data/<batch>/manifest.json plus one shard per day
+  // (see static_export.py). The most recent days are fetched first so the
+  // page renders before the whole history is in.
+  const fetchShardedTimeline = async (isCurrent) => {
+    const dataBase = `${import.meta.env.BASE_URL}data/${selectedBatch}/`
+    // Shard names change with their content; only the manifest can go stale
+    const manifest = (await axios.get(`${dataBase}manifest.json`, { headers: { 'Cache-Control': 'no-cache' } })).data
+    if (!isCurrent()) return
+    const fetchDays = (entries) => Promise.all(entries.map(d => axios.get(`${dataBase}${d.file}`).then(res => res.data)))
+
+    const transcriptUrls = {}
+    Object.entries(manifest.transcripts).forEach(([id, file]) => { transcriptUrls[id] = `${dataBase}${file}` })
+    setTranscriptFiles(transcriptUrls)
+
+    const split = Math.max(manifest.days.length - FIRST_PAINT_DAYS, 0)
+    const recent = await fetchDays(manifest.days.slice(split))
+    if (!isCurrent()) return
+    setTimeline(recent)
+    setFilteredTimeline(recent)
+    setSelectedDate(null)
+
+    const older = await fetchDays(manifest.days.slice(0, split))
+    if (older.length && isCurrent()) setTimeline([...older, ...recent])
+  }
+
   const fetchTimeline = async () => {
+    // Determine which timeline file to load based on selected batch
+    const timelineFile = selectedBatch === 'dec2025' ? 'timeline_dec2025.json' : 'timeline.json';
+    // Switching batches mid-load must not let the previous batch overwrite the new one
+    const request = ++timelineRequest.current
+    const isCurrent = () => request === timelineRequest.current
     try {
-      // Determine which timeline file to load based on selected batch
-      const timelineFile = selectedBatch === 'dec2025' ? 'timeline_dec2025.json' : 'timeline.json';
+      if (IS_PROD) {
+        try {
+          await fetchShardedTimeline(isCurrent)
+          return
+        } catch (err) {
+          if (!isCurrent()) return
+          // Older deployments only have the single timeline file
+          console.warn("No sharded timeline, loading the full file", err)
+          setTranscriptFiles({})
+        }
+      }
 
       // In prod, use static JSON. in Dev, use API.
       const url = IS_PROD
         ? `${import.meta.env.BASE_URL}${timelineFile}?v=5`
-        : `http://localhost:8000/api/timeline${selectedBatch === 'dec2025' ? '_dec2025' : ''}`;
+        : `${API_BASE}/batches/${selectedBatch}/timeline`;
 
       const res = await axios.get(url)
+      if (!isCurrent()) return
       setTimeline(res.data)
       setFilteredTimeline(res.data)
       setSelectedDate(null) // Reset date filter when switching batches
@@ -107,6 +176,7 @@ function App() {
       if (!IS_PROD) {
         try {
           const res = await axios.get(`/${timelineFile}`);
+          if (!isCurrent()) return;
           setTimeline(res.data);
           setFilteredTimeline(res.data);
         } catch (e) {/* ignore */ }
@@ -124,6 +194,15 @@ function App() {
     setSummary('')
     // removed window.scrollTo to preserve user position
 
+    // Show the summary as soon as the first tokens arrive
+    let received = '';
+    const appendToken = (token) => {
+      if (!token) return;
+      received += token;
+      setSummary(received);
+      setLoadingSummary(false);
+    };
+
     try {
       if (IS_PROD || groqKey) {
         // Client-side summarization using Groq
@@ -144,7 +223,8 @@ function App() {
             ],
             model: "llama-3.3-70b-versatile",
             temperature: 0.5,
-            max_tokens: 1024
+            max_tokens: 1024,
+            stream: true
           })
         });
 
@@ -153,14 +233,32 @@ function App() {
           throw new Error(errData.error?.message || "Groq request failed");
         }
 
-        const data = await response.json();
-        setSummary(data.choices[0]?.message?.content || "No summary generated.");
+        await readEventStream(response, (data) => {
+          if (data === '[DONE]') return;
+          appendToken(JSON.parse(data).choices[0]?.delta?.content);
+        });
 
       } else {
         // Dev mode backend fallback
-        const res = await axios.post(`${API_BASE}/summary`, { text })
-        setSummary(res.data.summary)
+        const response = await fetch(`${API_BASE}/summary/stream`, {
+          method: "POST",
+          headers: { "Content-Type": "application/json" },
+          body: JSON.stringify({ text })
+        });
+        if (!response.ok) {
+          const errData = await response.json();
+          throw new Error(errData.detail || "Summary request failed");
+        }
+
+        await readEventStream(response, (data) => {
+          if (data === '[DONE]') return;
+          const event = JSON.parse(data);
+          if (event.error) throw new Error(event.error);
+          appendToken(event.token);
+        });
       }
+
+      if (!received) setSummary("No summary generated.");
     } catch (err) {
       console.error(err)
       alert(`Failed to generate summary: ${err.message}`)
@@ -177,6 +275,26 @@ function App() {
     }))
   }
 
+  // Timeline transcripts may be stubs (id, length, preview); fetch the body once
+  const loadTranscript = async (transcript) => {
+    if (!transcript.transcript_id) return transcript.content
+    if (transcriptBodies[transcript.transcript_id]) return transcriptBodies[transcript.transcript_id]
+    try {
+      const url = IS_PROD
+        ? transcriptFiles[transcript.transcript_id]
+        : `${API_BASE}/transcripts/${transcript.transcript_id}`
+      if (!url) return transcript.content
+      const res = await axios.get(url)
+      setTranscriptBodies(prev => ({ ...prev, [transcript.transcript_id]: res.data.content }))
+      return res.data.content
+    } catch (err) {
+      console.error("Failed to fetch transcript", err)
+      return transcript.content
+    }
+  }
+
+  const transcriptLength = (m) => m.transcript_length ?? m.content.length
+
   // Fallback URL extractor if backend didn't provide one
   const extractUrl = (text) => {
     if (!text) return null
@@ -342,9 +460,9 @@ function App() {
                             m.content &&
                             !m.content.includes('[Transcript Unavailable]') &&
                             !m.content.includes('[No transcript available]') &&
-                            m.content.length > 100 // Skip very short transcripts
+                            transcriptLength(m) > 100 // Skip very short transcripts
                           )
-                          .sort((a, b) => b.content.length - a.content.length)[0] // Get longest transcript
+                          .sort((a, b) => transcriptLength(b) - transcriptLength(a))[0] // Get longest transcript
                         : null;
 
                       const uniqueId = `${day.date}-${msgIndex}`
@@ -458,7 +576,7 @@ function App() {
                                       Video Transcript
                                     </h4>
                                     <button
-                                      onClick={() => handleSummarize(associatedTranscript.content)}
+                                      onClick={async () => handleSummarize(await loadTranscript(associatedTranscript))}
                                       className="text-xs font-medium text-indigo-400 hover:text-indigo-600 transition-colors flex items-center gap-1.5 p-2 rounded-lg hover:bg-indigo-50"
                                       title="Summarize using AI"
                                     >
@@ -467,10 +585,13 @@ function App() {
                                     </button>
                                   </div>
                                   <div className={`text-[15px] leading-relaxed text-slate-600 italic ${!expandedTranscripts[`transcript-${uniqueId}`] ? 'line-clamp-3' : ''}`}>
-                                    {associatedTranscript.content}
+                                    {transcriptBodies[associatedTranscript.transcript_id] ?? associatedTranscript.content}
                                   </div>
                                   <button
-                                    onClick={() => toggleTranscript(`transcript-${uniqueId}`)}
+                                    onClick={() => {
+                                      loadTranscript(associatedTranscript)
+                                      toggleTranscript(`transcript-${uniqueId}`)
+                                    }}
                                     className="mt-3 flex items-center gap-1.5 px-4 py-2 rounded-xl text-xs font-bold text-orange-600 bg-orange-50 hover:bg-orange-100 hover:text-orange-700 transition-all duration-300 group/btn"
                                   >
                                     {expandedTranscripts[`transcript-${uniqueId}`] ? (
@@ -0,0 +1,267 @@
+import re
+import math
+from datetime import date
+from typing import Any
+import numpy as np
+import faiss
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.documents import Document
+
+TOKEN_PATTERN = re.compile(r'\w+')
+# Reciprocal rank fusion constant (Cormack et al.)
+RRF_K = 60
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Candidates per ranker that take part in fusion
+FETCH_K = 50
+# Above this many filtered candidates, fall back to a FAISS search
+# restricted with an ID selector instead of scoring vectors one by one
+MAX_EXACT_CANDIDATES = 4096
+# Fused-score bonus for chunks matching a guessed type or sender; half of
+# what a first place in one ranking is worth
+INFERRED_BOOST = 0.5 / (RRF_K + 1)
+
+MONTHS = {m: i for i, m in enumerate(
+    ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"], 1)}
+NUMERIC_DATE_PATTERN = re.compile(r'\b(\d{1,2})/(\d{1,2})(?:/(\d{2,4}))?\b')
+NAMED_DATE_PATTERN = re.compile(
+    r'\b(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?\s+(\d{1,2})(?:st|nd|rd|th)?(?:,?\s+(\d{4}))?\b',
+    re.IGNORECASE,
+)
+TRANSCRIPT_WORDS = {"video", "videos", "transcript", "transcripts", "youtube"}
+# A sender named right next to one of these is what the question is about
+SPEECH_WORDS = {
+    "say", "said", "says", "saying", "wrote", "write", "writes", "post", "posted", "posts",
+    "mention", "mentioned", "mentions", "ask", "asked", "asks", "tell", "told", "tells",
+    "share", "shared", "shares",
+}
+# Words between a sender and a speech word ("did X Y say")
+SPEECH_WINDOW = 2
+# Never treated as part of a sender name
+STOPWORDS = {
+    "the", "and", "what", "who", "did", "does", "say", "said", "about", "from", "with", "that",
+    "this", "for", "was", "were", "are", "how", "why", "when", "where", "on", "in", "of", "to",
+    "any", "all", "share", "shared", "video", "videos", "chat", "group", "message", "messages",
+    "january", "february", "march", "april", "june", "july", "august", "september", "october",
+    "november", "december", *MONTHS,
+}
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower()) if text else []
+
+
+def _date_matches(iso, filters):
+    if filters.get("date_from") and iso < filters["date_from"]:
+        return False
+    if filters.get("date_to") and iso > filters["date_to"]:
+        return False
+    days = filters.get("dates")
+    # Entries are full ISO dates, or "-MM-DD" suffixes when no year was given
+    return not days or any(iso == d or (d.startswith("-") and iso.endswith(d)) for d in days)
+
+
+class HybridIndex:
+    """
+    BM25 over the chunks of a FAISS vector store, fused with dense scores.
+
+    Metadata filters (batch, type, date range, senders) are resolved first
+    to a candidate set; BM25 and vector scores are then computed for those
+    candidates only, and the two rankings are merged with reciprocal rank
+    fusion. Questions like "what did X say on 12/08" therefore touch a
+    handful of chunks rather than the whole vector space.
+    """
+
+    def __init__(self, vector_store):
+        self.vector_store = vector_store
+        self.index = vector_store.index
+        self.positions = sorted(vector_store.index_to_docstore_id)
+        self.docs = [vector_store.docstore.search(vector_store.index_to_docstore_id[p]) for p in self.positions]
+
+        # term -> {doc: term frequency}
+        self.postings = {}
+        self.lengths = []
+        self.sender_tokens = {}  # token -> {sender names}
+        # field -> value -> [doc IDs], for resolving filters without a scan
+        self.metadata = {"batch": {}, "type": {}, "date": {}, "sender": {}}
+        for doc_id, doc in enumerate(self.docs):
+            meta = doc.metadata
+            for field in ("batch", "type", "date"):
+                self.metadata[field].setdefault(meta.get(field), []).append(doc_id)
+            tokens = tokenize(doc.page_content)
+            self.lengths.append(len(tokens))
+            for term in tokens:
+                tf = self.postings.setdefault(term, {})
+                tf[doc_id] = tf.get(doc_id, 0) + 1
+            for sender in meta.get("senders", ()):
+                self.metadata["sender"].setdefault(sender, []).append(doc_id)
+                for token in tokenize(sender):
+                    self.sender_tokens.setdefault(token, set()).add(sender)
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+
+    def _senders_in(self, words):
+        """Senders whose name contains one of words."""
+        senders = set()
+        for word in words:
+            if len(word) > 2 and word not in STOPWORDS and not word.isdigit():
+                senders |= self.sender_tokens.get(word, set())
+        return senders
+
+    def infer_filters(self, question):
+        """
+        Filters the question clearly asks for: dates ("12/08", "Dec 8th"),
+        and senders named right next to a speech word ("what did Meenakshi
+        say"). A word that merely occurs in some sender name is only a
+        boost (see infer_boosts), not a filter.
+        """
+        filters = {}
+        days = set()
+        for month, day, year in NUMERIC_DATE_PATTERN.findall(question):
+            days.add(self._day_key(int(month), int(day), year))
+        for month, day, year in NAMED_DATE_PATTERN.findall(question):
+            days.add(self._day_key(MONTHS[month[:3].lower()], int(day), year))
+        days.discard(None)
+        if days:
+            filters["dates"] = days
+
+        words = tokenize(question)
+        near_speech = [
+            word for i, word in enumerate(words)
+            if any(w in SPEECH_WORDS for w in words[max(0, i - SPEECH_WINDOW):i + SPEECH_WINDOW + 1])
+        ]
+        senders = self._senders_in(near_speech)
+        if senders:
+            filters["senders"] = senders
+        return filters
+
+    def infer_boosts(self, question):
+        """
+        Guesses that rank matching chunks higher without excluding others:
+        transcripts when the question mentions videos, and any sender whose
+        name shares a word with the question.
+        """
+        words = tokenize(question)
+        boosts = {}
+        senders = self._senders_in(words)
+        if senders:
+            boosts["senders"] = senders
+        if TRANSCRIPT_WORDS & set(words):
+            boosts["type"] = "transcript"
+        return boosts
+
+    @staticmethod
+    def _day_key(month, day, year):
+        if year and len(year) == 2:
+            year = "20" + year
+        try:
+            date(int(year) if year else 2000, month, day)
+        except ValueError:
+            return None
+        return f"{year}-{month:02d}-{day:02d}" if year else f"-{month:02d}-{day:02d}"
+
+    def candidates(self, filters):
+        """Sorted doc IDs matching every filter, or None when nothing is filtered."""
+        groups = []
+        for field in ("batch", "type"):
+            if filters.get(field):
+                groups.append(self.metadata[field].get(filters[field], []))
+        if filters.get("senders"):
+            groups.append([d for s in filters["senders"] for d in self.metadata["sender"].get(s, [])])
+        if any(filters.get(k) for k in ("dates", "date_from", "date_to")):
+            groups.append([
+                d for iso, ids in self.metadata["date"].items()
+                if iso and _date_matches(iso, filters) for d in ids
+            ])
+        if not groups:
+            return None
+
+        matched = set(min(groups, key=len))
+        for ids in groups:
+            matched &= set(ids)
+        return sorted(matched)
+
+    def bm25(self, question, candidates, limit):
+        scores = {}
+        n = len(self.docs)
+        allowed = set(candidates) if candidates is not None else None
+        for term in set(tokenize(question)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings.items():
+                if allowed is not None and doc_id not in allowed:
+                    continue
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[doc_id] / (self.avg_length or 1))
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return sorted(scores, key=scores.get, reverse=True)[:limit]
+
+    def dense(self, question, candidates, limit):
+        query = np.array([self.vector_store.embeddings.embed_query(question)], dtype="float32")
+        if getattr(self.vector_store, "_normalize_L2", False):
+            faiss.normalize_L2(query)
+        higher_is_better = self.index.metric_type == faiss.METRIC_INNER_PRODUCT
+
+        if candidates is not None and len(candidates) <= MAX_EXACT_CANDIDATES:
+            if not candidates:
+                return []
+            ids = np.array([self.positions[d] for d in candidates], dtype="int64")
+            vectors = self.index.reconstruct_batch(ids)
+            if higher_is_better:
+                scores = -(vectors @ query[0])
+            else:
+                scores = ((vectors - query[0]) ** 2).sum(axis=1)
+            order = np.argsort(scores)[:limit]
+            return [candidates[i] for i in order]
+
+        params = None
+        if candidates is not None:
+            ids = np.array([self.positions[d] for d in candidates], dtype="int64")
+            params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(ids))
+        _, found = self.index.search(query, min(limit, len(self.docs)), params=params)
+        doc_of = {p: d for d, p in enumerate(self.positions)}
+        return [doc_of[p] for p in found[0] if p in doc_of]
+
+    def search(self, question, k=5, filters=None, infer=True):
+        """
+        Returns the k best Documents for question. Explicit filters always
+        apply; inferred ones are dropped one at a time (senders, then dates)
+        until some chunk matches. Inferred boosts only reorder the fusion.
+        """
+        if not self.docs:
+            return []
+        explicit = dict(filters or {})
+        inferred = self.infer_filters(question) if infer else {}
+        boosts = self.infer_boosts(question) if infer else {}
+
+        candidates = None
+        for relaxed in ((), ("senders",), ("senders", "dates")):
+            attempt = {k: v for k, v in inferred.items() if k not in relaxed}
+            candidates = self.candidates({**attempt, **explicit})
+            if candidates is None or candidates:
+                break
+
+        fused = {}
+        for ranking in (self.bm25(question, candidates, FETCH_K), self.dense(question, candidates, FETCH_K)):
+            for rank, doc_id in enumerate(ranking):
+                fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+        for doc_id in fused:
+            meta = self.docs[doc_id].metadata
+            if boosts.get("type") and meta.get("type") == boosts["type"]:
+                fused[doc_id] += INFERRED_BOOST
+            if boosts.get("senders") and boosts["senders"] & set(meta.get("senders", ())):
+                fused[doc_id] += INFERRED_BOOST
+        best = sorted(fused, key=fused.get, reverse=True)[:k]
+        return [self.docs[doc_id] for doc_id in best]
+
+
+class HybridRetriever(BaseRetriever):
+    """LangChain retriever over a HybridIndex."""
+
+    index: Any
+    k: int = 5
+    search_filter: dict = {}
+    infer_filters: bool = True
+
+    def _get_relevant_documents(self, query, *, run_manager=None) -> list[Document]:
+        return self.index.search(query, k=self.k, filters=self.search_filter, infer=self.infer_filters)
@@ -1,6 +1,16 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from youtube_transcript_api import YouTubeTranscriptApi
 from urllib.parse import urlparse, parse_qs
 
+# Transcript requests in flight at once
+MAX_WORKERS = 8
+
+# Transcripts fetched so far in this process, by video ID. Shared by every
+# process_messages() call; failures are not cached so they get retried.
+_transcript_cache = {}
+_transcript_cache_lock = threading.Lock()
+
 def extract_video_id(url):
     """
     Examples:
@@ -23,11 +33,7 @@ def extract_video_id(url):
     # fail?
     return None
 
-def get_video_transcript(video_url):
-    video_id = extract_video_id(video_url)
-    if not video_id:
-        return ""
-    
+def get_transcript_by_id(video_id):
     try:
         transcript_list = YouTubeTranscriptApi.get_transcript(video_id)
         # Combine text
@@ -36,29 +42,73 @@ def get_video_transcript(video_url):
     except Exception as e:
         return f"[Could not get transcript for video: {e}]"
 
+def get_video_transcript(video_url):
+    video_id = extract_video_id(video_url)
+    if not video_id:
+        return ""
+    return fetch_transcripts([video_id])[video_id]
+
+def fetch_transcripts(video_ids, max_workers=MAX_WORKERS, fetch=get_transcript_by_id):
+    """
+    Returns {video_id: transcript} for video_ids, fetching the ones not in
+    the shared cache concurrently. fetch(video_id) can be swapped out, e.g.
+    for a fake in tests.
+    """
+    video_ids = list(dict.fromkeys(video_ids))
+    with _transcript_cache_lock:
+        results = {v: _transcript_cache[v] for v in video_ids if v in _transcript_cache}
+    missing = [v for v in video_ids if v not in results]
+
+    if missing:
+        print(f"Fetching {len(missing)} transcripts ({len(results)} cached)...")
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for video_id, transcript in zip(missing, pool.map(fetch, missing)):
+                results[video_id] = transcript
+
+        with _transcript_cache_lock:
+            for video_id in missing:
+                if not results[video_id].startswith("[Could not get transcript"):
+                    _transcript_cache[video_id] = results[video_id]
+    return results
+
 def process_messages(messages):
     """
     Takes raw scraped messages and enriches them.
+
+    Runs in two passes: the YouTube videos linked anywhere in messages are
+    collected and each distinct one is fetched once, concurrently; then the
+    text is assembled with every transcript placed under each message that
+    links to it.
     """
-    processed_text = ""
-    
+    def youtube_links(msg):
+        return [l for l in msg.get('links', []) if 'youtube.com' in l or 'youtu.be' in l]
+
+    # Pass 1: unique video IDs across all messages
+    video_ids = []
+    for msg in messages:
+        for link in youtube_links(msg):
+            video_id = extract_video_id(link)
+            if video_id:
+                video_ids.append(video_id)
+    transcripts = fetch_transcripts(video_ids) if video_ids else {}
+
+    # Pass 2: assemble
+    parts = []
     for msg in messages:
         # Metadata usually looks like "[10:00, 1/1/2024] Name: "
         # We clean it slightly
         header = msg.get('metadata', '').strip()
         content = msg.get('text', '').strip()
-        links = msg.get('links', [])
         
         # Append base message
-        entry = f"{header} {content}\n"
+        parts.append(f"{header} {content}\n")
         
         # Check links for YouTube
-        for link in links:
-            if 'youtube.com' in link or 'youtu.be' in link:
-                print(f"Found YouTube link: {link} - Fetching transcript...")
-                transcript = get_video_transcript(link)
-                entry += f"\n   >>> {transcript}\n"
+        for link in youtube_links(msg):
+            video_id = extract_video_id(link)
+            transcript = transcripts[video_id] if video_id else ""
+            parts.append(f"\n   >>> {transcript}\n")
         
-        processed_text += entry + "\n"
+        parts.append("\n")
         
-    return processed_text
+    return "".join(parts)
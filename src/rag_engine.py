@@ -1,4 +1,9 @@
 import os
+import pickle
+import shutil
+import hashlib
+import json
+import faiss
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_groq import ChatGroq
 from langchain_community.vectorstores import FAISS
@@ -7,22 +12,52 @@ from langchain.chains import RetrievalQA
 from langchain.schema import Document
 from langchain.prompts import PromptTemplate
 from dotenv import load_dotenv
+from .embedding_cache import EmbeddingCache, hash_text
+from .answer_cache import AnswerCache, ANSWER_CACHE_TTL
+from .hybrid_retriever import HybridIndex, HybridRetriever
+from .chunker import chunk_timeline, CHUNK_TOKENS
+from .embedding_pipeline import EmbeddingPipeline, EMBED_BATCH_SIZE, EMBED_CONCURRENCY
 
 load_dotenv()
 
+EMBEDDING_MODEL = "models/text-embedding-004"
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+CHUNK_SEPARATORS = ["\n\n", "\n", " ", ""]
+# Where FAISS indexes are persisted between runs
+INDEX_CACHE_DIR = ".rag_cache"
+# Most recent indexes kept on disk; older ones are pruned after a save
+INDEX_CACHE_LIMIT = 3
+# Chunk text hash -> vector, shared by every index in INDEX_CACHE_DIR
+EMBEDDING_CACHE_FILE = "embeddings.sqlite3"
+
 class RAGSystem:
-    def __init__(self, google_api_key=None, groq_api_key=None):
+    def __init__(self, google_api_key=None, groq_api_key=None, cache_dir=INDEX_CACHE_DIR,
+                 embed_batch_size=EMBED_BATCH_SIZE, embed_concurrency=EMBED_CONCURRENCY,
+                 answer_cache_ttl=ANSWER_CACHE_TTL, answer_similarity=None,
+                 embeddings=None, embedding_model=None):
+        """
+        embeddings: any LangChain Embeddings to use instead of Google's, e.g.
+        a client for a local stub server. embedding_model names it in cache
+        keys (defaults to its class name), so its vectors and indexes are
+        never mixed up with Google's.
+        """
         self.google_api_key = google_api_key or os.getenv("GOOGLE_API_KEY")
         self.groq_api_key = groq_api_key or os.getenv("GROQ_API_KEY")
         
-        if not self.google_api_key:
+        if embeddings is None and not self.google_api_key:
             raise ValueError("Google API Key is missing (for Embeddings). Please set GOOGLE_API_KEY in .env.")
         
         if not self.groq_api_key:
             raise ValueError("Groq API Key is missing (for LLM). Please set GROQ_API_KEY in .env.")
         
-        # Using Google for Embeddings (Robust & Free tier available)
-        self.embeddings = GoogleGenerativeAIEmbeddings(model="models/text-embedding-004", google_api_key=self.google_api_key)
+        if embeddings is not None:
+            self.embeddings = embeddings
+            self.embedding_model = embedding_model or type(embeddings).__name__
+        else:
+            # Using Google for Embeddings (Robust & Free tier available)
+            self.embeddings = GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL, google_api_key=self.google_api_key)
+            self.embedding_model = EMBEDDING_MODEL
         
         # Using Groq for LLM (Fast inference)
         self.llm = ChatGroq(
@@ -31,17 +66,147 @@ class RAGSystem:
             groq_api_key=self.groq_api_key
         )
         
+        self.embedding_pipeline = EmbeddingPipeline(
+            self.embeddings, batch_size=embed_batch_size, max_concurrency=embed_concurrency
+        )
+
+        self.cache_dir = cache_dir
+        self.embedding_cache = None
         self.vector_store = None
         self.qa_chain = None
+        self.search_filter = None
+
+        # Answers are only reused for the index they were generated from.
+        # answer_similarity (cosine, e.g. 0.95) also reuses them for
+        # near-identical questions, at the cost of embedding each question.
+        self.index_version = 0
+        self.answer_cache = AnswerCache(
+            ttl=answer_cache_ttl,
+            similarity_threshold=answer_similarity,
+            embed=lambda q: self.embeddings.embed_query(q),
+        )
+
+    def _get_embedding_cache(self):
+        if self.embedding_cache is None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self.embedding_cache = EmbeddingCache(
+                os.path.join(self.cache_dir, EMBEDDING_CACHE_FILE), self.embedding_model
+            )
+        return self.embedding_cache
+
+    def _index_key(self, text_data):
+        """
+        Content hash of everything that determines the index: the ingested
+        text, the chunking parameters and the embedding model.
+        """
+        digest = hashlib.sha256()
+        params = f"{self.embedding_model}|{CHUNK_SIZE}|{CHUNK_OVERLAP}|{CHUNK_SEPARATORS!r}"
+        digest.update(params.encode("utf-8"))
+        digest.update(text_data.encode("utf-8"))
+        return digest.hexdigest()[:24]
+
+    def _index_prefix(self):
+        """Directory name prefix shared by every index built with this embedding model."""
+        return f"faiss-{hash_text(self.embedding_model)[:8]}-"
+
+    def _index_dir(self, key):
+        return os.path.join(self.cache_dir, self._index_prefix() + key)
+
+    def load_index(self, index_dir, mmap=True):
+        """
+        Loads an index written by save_local(). By default the vectors are
+        memory-mapped read-only rather than read into memory, so startup cost
+        does not grow with index size. Pass mmap=False to get an index that
+        can be appended to.
+        """
+        mmap_flag = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+        index_file = os.path.join(index_dir, "index.faiss")
+        try:
+            if not mmap:
+                raise RuntimeError("mmap disabled")
+            index = faiss.read_index(index_file, mmap_flag | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError:
+            # Older FAISS builds cannot mmap flat indexes
+            index = faiss.read_index(index_file)
+
+        with open(os.path.join(index_dir, "index.pkl"), "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+
+        self.vector_store = FAISS(self.embeddings, index, docstore, index_to_docstore_id)
+        self.qa_chain = None
+        self._invalidate_answers()
+
+    def _invalidate_answers(self):
+        self.index_version += 1
+        self.answer_cache.clear()
+
+    def save_index(self, index_dir):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Write to a temp dir and rename, so a crash never leaves a partial index
+        tmp_dir = index_dir + ".tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        self.vector_store.save_local(tmp_dir)
+        shutil.rmtree(index_dir, ignore_errors=True)
+        os.replace(tmp_dir, index_dir)
+        self._prune_index_cache(keep=index_dir)
+
+    def _latest_index_dir(self):
+        """Newest index built with this embedding model; another model's vectors are never reused."""
+        if not os.path.isdir(self.cache_dir):
+            return None
+        prefix = self._index_prefix()
+        dirs = [
+            os.path.join(self.cache_dir, d) for d in os.listdir(self.cache_dir)
+            if d.startswith(prefix) and not d.endswith(".tmp")
+        ]
+        return max(dirs, key=os.path.getmtime) if dirs else None
+
+    def _prune_index_cache(self, keep):
+        dirs = [
+            os.path.join(self.cache_dir, d) for d in os.listdir(self.cache_dir)
+            if d.startswith("faiss-") and not d.endswith(".tmp")
+        ]
+        dirs.sort(key=os.path.getmtime, reverse=True)
+        for stale in [d for d in dirs if d != keep][INDEX_CACHE_LIMIT - 1:]:
+            shutil.rmtree(stale, ignore_errors=True)
+
+    def _load_cached_index(self, index_dir):
+        if not os.path.exists(os.path.join(index_dir, "index.faiss")):
+            return False
+        try:
+            self.load_index(index_dir)
+            print(f"Loaded cached vector store from {index_dir}.")
+            return True
+        except Exception as e:
+            print(f"Could not load cached vector store ({e}), rebuilding...")
+            return False
+
+    def _build_and_save(self, index_dir, docs):
+        self._ingest_documents(docs)
+        if not self.vector_store:
+            return
+
+        try:
+            self.save_index(index_dir)
+            print(f"Saved vector store to {index_dir}.")
+        except OSError as e:
+            print(f"Could not save vector store: {e}")
 
     def ingest_data(self, text_data):
         """
         Ingests text data, splits it, embeds it, and creates a vector store.
+        The index is saved under cache_dir, keyed by a hash of the text and
+        chunking parameters, so unchanged data loads from disk instead of
+        being embedded again.
         """
+        index_dir = self._index_dir(self._index_key(text_data))
+        if self._load_cached_index(index_dir):
+            return
+
         text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            separators=["\n\n", "\n", " ", ""]
+            chunk_size=CHUNK_SIZE,
+            chunk_overlap=CHUNK_OVERLAP,
+            separators=CHUNK_SEPARATORS
         )
         
         texts = text_splitter.split_text(text_data)
@@ -50,17 +215,140 @@ class RAGSystem:
             return
 
         docs = [Document(page_content=t) for t in texts]
-        
-        print(f"Creating embeddings for {len(docs)} documents (using Google GenAI Embeddings)...")
-        # Retry logic or robust creation could be added here
-        self.vector_store = FAISS.from_documents(docs, self.embeddings)
+        self._build_and_save(index_dir, docs)
+
+    def ingest_timelines(self, timelines, transcript_store=None, max_tokens=CHUNK_TOKENS):
+        """
+        Ingests parsed timelines ({batch_id: ChatParser.parse() output}).
+        Messages are chunked whole with their date, senders, video IDs and
+        batch as metadata (see chunker.chunk_timeline), so retrieval can be
+        filtered on them. Chunks don't overlap, which keeps the number of
+        embeddings well below the plain-text path for the same corpus.
+        """
+        docs = []
+        for batch, timeline in timelines.items():
+            for chunk in chunk_timeline(timeline, batch=batch, transcript_store=transcript_store,
+                                        max_tokens=max_tokens):
+                docs.append(Document(page_content=chunk["text"], metadata=chunk["metadata"]))
+        if not docs:
+            print("Warning: No text found to ingest.")
+            return
+
+        digest = hashlib.sha256(f"{self.embedding_model}|timeline|{max_tokens}".encode("utf-8"))
+        for doc in docs:
+            digest.update(self._chunk_id(doc).encode("ascii"))
+        index_dir = self._index_dir(digest.hexdigest()[:24])
+        if self._load_cached_index(index_dir):
+            return
+        print(f"Chunked {len(timelines)} timeline(s) into {len(docs)} chunks.")
+        self._build_and_save(index_dir, docs)
+
+    def ingest_timeline(self, timeline, batch=None, transcript_store=None):
+        self.ingest_timelines({batch: timeline}, transcript_store=transcript_store)
+
+    def _embed_with_cache(self, texts):
+        """
+        Returns one vector per text, embedding only the texts whose hash is not
+        already in the embedding cache. Misses are embedded in concurrent
+        batches and each batch is cached as soon as it returns, so an
+        interrupted run resumes where it stopped.
+        """
+        cache = self._get_embedding_cache()
+        hashes = [hash_text(t) for t in texts]
+        vectors = cache.get_many(set(hashes))
+
+        misses = {}
+        for h, t in zip(hashes, texts):
+            if h not in vectors:
+                misses[h] = t
+        print(f"Embedding {len(misses)} new chunks ({len(texts) - len(misses)} cached, using {self.embedding_model})...")
+        if misses:
+            miss_hashes = list(misses)
+
+            def store_batch(offset, batch_vectors):
+                batch = dict(zip(miss_hashes[offset:offset + len(batch_vectors)], batch_vectors))
+                cache.put_many(batch)
+                vectors.update(batch)
+
+            self.embedding_pipeline.embed(list(misses.values()), on_batch=store_batch)
+            stats = self.embedding_pipeline.stats
+            print(f"Embedded {stats['chunks']} chunks in {stats['batches']} batches "
+                  f"({stats['chunks_per_sec']:.1f} chunks/sec, {stats['retries']} retries).")
+
+        return [vectors[h] for h in hashes]
+
+    def _chunk_id(self, doc):
+        """Docstore ID of a chunk: a hash of the embedding model, its metadata and text."""
+        metadata = json.dumps(doc.metadata, sort_keys=True, default=str)
+        return hash_text(f"{self.embedding_model}\n{metadata}\n{doc.page_content}")
+
+    def _ingest_documents(self, docs):
+        """
+        Brings the vector store in line with docs. Chunks are identified by
+        content hash, so when the previous index is available only chunks
+        that are new are added to it and chunks that disappeared are deleted;
+        everything else is reused as is.
+        """
+        # Identical chunks would only produce duplicate search hits
+        unique = {}
+        for doc in docs:
+            unique.setdefault(self._chunk_id(doc), doc)
+        ids = list(unique)
+
+        previous = self._latest_index_dir()
+        if previous:
+            try:
+                self.load_index(previous, mmap=False)
+            except Exception as e:
+                print(f"Could not load previous vector store ({e}), building a new one...")
+                self.vector_store = None
+
+        existing = set(self.vector_store.index_to_docstore_id.values()) if self.vector_store else set()
+        if not existing & unique.keys():
+            # Nothing to reuse (or an index from before chunk IDs were hashes)
+            self.vector_store = None
+            existing = set()
+
+        new_ids = [i for i in ids if i not in existing]
+        stale_ids = list(existing - unique.keys())
+        new_docs = [unique[i] for i in new_ids]
+        vectors = self._embed_with_cache([d.page_content for d in new_docs])
+        text_embeddings = [(d.page_content, v) for d, v in zip(new_docs, vectors)]
+        metadatas = [d.metadata for d in new_docs]
+
+        if self.vector_store is None:
+            if not text_embeddings:
+                print("Warning: No text found to ingest.")
+                return
+            self.vector_store = FAISS.from_embeddings(
+                text_embeddings, self.embeddings, metadatas=metadatas, ids=new_ids
+            )
+        else:
+            if stale_ids:
+                self.vector_store.delete(stale_ids)
+            if text_embeddings:
+                self.vector_store.add_embeddings(text_embeddings, metadatas=metadatas, ids=new_ids)
+            print(f"Updated vector store: {len(new_ids)} chunks added, {len(stale_ids)} removed.")
+
+        self.qa_chain = None
+        self._invalidate_answers()
         print("Vector store created successfully.")
 
-    def setup_chain(self):
+    def setup_chain(self, search_filter=None):
+        """
+        Retrieval is hybrid: BM25 and vector scores fused over the chunks
+        that pass the metadata filters. search_filter always applies, e.g.
+        {"batch": "dec2025"}, {"type": "transcript"} or
+        {"date_from": "2025-12-01", "date_to": "2025-12-31"}; dates and
+        sender names mentioned in the question narrow it further.
+        """
         if not self.vector_store:
             raise ValueError("Vector store not initialized. Call ingest_data first.")
             
-        retriever = self.vector_store.as_retriever(search_kwargs={"k": 5})
+        self.search_filter = search_filter
+        retriever = HybridRetriever(
+            index=HybridIndex(self.vector_store), k=5, search_filter=search_filter or {}
+        )
         
         prompt_template = """You are a helpful AI assistant analyzing a WhatsApp chat history. 
         Use the provided context to answer the question.
@@ -78,6 +366,10 @@ class RAGSystem:
             template=prompt_template, input_variables=["context", "question"]
         )
 
+        # Kept for stream_query(), which runs the same steps by hand
+        self.retriever = retriever
+        self.prompt = PROMPT
+
         self.qa_chain = RetrievalQA.from_chain_type(
             llm=self.llm,
             chain_type="stuff",
@@ -89,6 +381,40 @@ class RAGSystem:
     def query(self, query_text):
         if not self.qa_chain:
             self.setup_chain()
-            
+
+        answer, vector = self.answer_cache.get(self._answer_scope(), query_text)
+        if answer is not None:
+            return answer
+
         result = self.qa_chain.invoke({"query": query_text})
+        self.answer_cache.put(self._answer_scope(), query_text, result["result"], vector)
         return result["result"]
+
+    def _answer_scope(self):
+        return (self.index_version, json.dumps(self.search_filter, sort_keys=True, default=str))
+
+    def stream_query(self, query_text):
+        """
+        Like query(), but yields the answer in pieces as the LLM produces
+        them. Retrieval and the prompt are the same as the "stuff" chain
+        used by query(); cached answers are yielded in one piece.
+        """
+        if not self.qa_chain:
+            self.setup_chain()
+
+        scope = self._answer_scope()
+        answer, vector = self.answer_cache.get(scope, query_text)
+        if answer is not None:
+            yield answer
+            return
+
+        docs = self.retriever.invoke(query_text)
+        context = "\n\n".join(doc.page_content for doc in docs)
+        prompt = self.prompt.format(context=context, question=query_text)
+
+        pieces = []
+        for chunk in self.llm.stream(prompt):
+            if chunk.content:
+                pieces.append(chunk.content)
+                yield chunk.content
+        self.answer_cache.put(scope, query_text, "".join(pieces), vector)